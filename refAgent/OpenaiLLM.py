@@ -1,10 +1,30 @@
 import openai
+import asyncio
+import threading
+import aiohttp
+
+class LLMError(Exception):
+    """
+    Raised instead of returning the "An error occurred: ..." reply when raise_errors is set.
+    """
 
 class OpenAILLM:
-    def __init__(self, api_key):
+    def __init__(self, api_key, cache=None):
         openai.api_key = api_key
+        self.cache = cache
     
-    def query_llm(self, prompt, query, model="gpt-4", max_tokens=4096):
+    def query_llm(self, prompt, query, model="gpt-4", max_tokens=4096, temperature=0.7, use_cache=True, raise_errors=False):
+        """
+        Query the chat model. Replies are served from and stored in the response cache, if any,
+        unless use_cache is False (e.g. when a fresh sample of the same prompt is wanted).
+        Failures are returned as an "An error occurred: ..." reply, or raised as LLMError if raise_errors is set.
+        """
+        use_cache = use_cache and self.cache is not None
+        if use_cache:
+            reply = self.cache.lookup(model, prompt, query, temperature, max_tokens)
+            if reply is not None:
+                return reply
+
         try:
             # Combine prompt and query
             full_prompt = f"{prompt}\n{query}"
@@ -17,12 +37,105 @@ class OpenAILLM:
                     {"role": "user", "content": query}
                 ],
                 max_tokens=max_tokens,  # Adjust based on needs
-                temperature=0.7,  # Adjust creativity
+                temperature=temperature,  # Adjust creativity
             )
             
             # Extract response text
             reply = response['choices'][0]['message']['content'].strip()
+            if use_cache:
+                self.cache.store(model, prompt, query, temperature, max_tokens, reply)
             return reply
         
         except Exception as e:
-            return f"An error occurred: {str(e)}"
\ No newline at end of file
+            if raise_errors:
+                raise LLMError(str(e)) from e
+            return f"An error occurred: {str(e)}"
+
+
+class AsyncOpenAILLM:
+    def __init__(self, api_key, max_concurrency=8, base_url="https://api.openai.com/v1", timeout=600, cache=None):
+        """
+        Asynchronous chat-completion client sharing one pooled HTTP session.
+        Requests run on a background event loop, at most max_concurrency at a time, so
+        several classes (or workers) can keep prompts in flight while others compile.
+        :param api_key: API key of the endpoint.
+        :param max_concurrency: Maximum number of requests in flight.
+        :param base_url: Base URL of the OpenAI-compatible API (e.g. https://api.deepseek.com/v1).
+        :param timeout: Timeout of a request in seconds.
+        :param cache: Optional LLMResponseCache shared by all requests.
+        """
+        self.api_key = api_key
+        self.cache = cache
+        self.max_concurrency = max_concurrency
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._open(), self._loop).result()
+
+    async def _open(self):
+        # The semaphore and the session must be created on the loop that uses them
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, keepalive_timeout=60)
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+            headers={"Authorization": f"Bearer {self.api_key}"}
+        )
+
+    async def aquery_llm(self, prompt, query, model="gpt-4", max_tokens=4096, temperature=0.7, use_cache=True,
+                         raise_errors=False):
+        use_cache = use_cache and self.cache is not None
+        loop = asyncio.get_running_loop()
+        if use_cache:
+            # The SQLite cache blocks, so it is read and written off the event loop to keep the other requests moving
+            reply = await loop.run_in_executor(None, self.cache.lookup, model, prompt, query, temperature, max_tokens)
+            if reply is not None:
+                return reply
+
+        try:
+            payload = {
+                "model": model,
+                "messages": [
+                    {"role": "system", "content": prompt},
+                    {"role": "user", "content": query}
+                ],
+                "max_tokens": max_tokens,
+                "temperature": temperature,
+            }
+            async with self._semaphore:
+                async with self._session.post(f"{self.base_url}/chat/completions", json=payload) as response:
+                    data = await response.json(content_type=None)
+                    if response.status != 200:
+                        raise Exception(f"{response.status}, {data}")
+
+            # Extract response text
+            reply = data['choices'][0]['message']['content'].strip()
+            if use_cache:
+                await loop.run_in_executor(None, self.cache.store, model, prompt, query, temperature, max_tokens, reply)
+            return reply
+
+        except Exception as e:
+            if raise_errors:
+                raise LLMError(str(e)) from e
+            return f"An error occurred: {str(e)}"
+
+    def submit(self, prompt, query, model="gpt-4", max_tokens=4096, temperature=0.7, use_cache=True, raise_errors=False):
+        """
+        Start a request without waiting for it.
+        :return: concurrent.futures.Future resolving to the reply text.
+        """
+        return asyncio.run_coroutine_threadsafe(
+            self.aquery_llm(prompt, query, model, max_tokens, temperature, use_cache, raise_errors), self._loop)
+
+    def query_llm(self, prompt, query, model="gpt-4", max_tokens=4096, temperature=0.7, use_cache=True, raise_errors=False):
+        """
+        Blocking call with the same interface as OpenAILLM.query_llm.
+        """
+        return self.submit(prompt, query, model, max_tokens, temperature, use_cache, raise_errors).result()
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
@@ -1,7 +1,20 @@
-from refAgent.java_metrics_calculator import JavaMetricsCalculator
-from refAgent.dependency_graph import JavaClassDependencyAnalyzer, draw_dependency_graph
+from refAgent.java_metrics_calculator import JavaMetricsCalculator, ProjectMetricsCalculator
+from refAgent.dependency_graph import JavaProjectDependencyIndex
 from utilities import *
-from refAgent.OpenaiLLM import OpenAILLM
+from refAgent.OpenaiLLM import OpenAILLM, AsyncOpenAILLM
+from refAgent.parse_cache import ParseCache
+from refAgent.llm_cache import LLMResponseCache
+from refAgent.workspace import WorkspacePool
+from refAgent.build_backend import create_build_backend
+from refAgent.ast_metrics import ASTMetricsCalculator
+from refAgent.run_journal import RunJournal
+from refAgent.test_selection import TestSelector
+from refAgent.project_graph import ProjectGraph
+from refAgent.syntax_gate import SyntaxGate, extract_code_block
+from refAgent.commit_batcher import CommitBatcher
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
+import threading
+import javalang
 import sys
 from settings import Settings
 import argparse
@@ -9,208 +22,525 @@ import argparse
 # === Parse project name argument ===
 parser = argparse.ArgumentParser(description="Refactor Java Project")
 parser.add_argument("project_name", type=str, help="Name of the project folder (e.g. accumulo-2.1)")
+parser.add_argument("--workers", type=int, default=1, help="Number of classes refactored in parallel, each in its own workspace")
+parser.add_argument("--workspace-mode", choices=["copy", "worktree"], default="copy",
+                    help="How each worker gets its private after-project: copy-on-write copy or git worktree")
+parser.add_argument("--llm-concurrency", type=int, default=0,
+                    help="Share one asynchronous, pooled LLM client allowing this many requests in flight (0 for blocking calls)")
+parser.add_argument("--compile-mode", choices=["clean", "incremental", "javac"], default="incremental",
+                    help="clean: mvn clean compile; incremental: build only the changed module and its dependents; "
+                         "javac: compile only the changed file against the cached module classpath")
+parser.add_argument("--build-backend", choices=["mvn", "mvnd"], default="mvn",
+                    help="mvn: a new Maven process per request; mvnd: keep warm Maven daemons for the whole run")
+parser.add_argument("--build-executable", type=str, default=None, help="Override the command of the build backend")
+parser.add_argument("--test-fork-count", type=str, default=None,
+                    help="Run the selected test classes in this many parallel surefire forks (e.g. 4 or 1C)")
+parser.add_argument("--no-fail-fast", action="store_true", help="Run all selected tests even after a failure")
+parser.add_argument("--metrics-engine", choices=["ast", "designite"], default="ast",
+                    help="Metrics given to the judge in the refactoring iterations: computed in-process from the AST, "
+                         "or with DesigniteJava (which always measures the accepted code)")
+parser.add_argument("--no-llm-cache", action="store_true", help="Do not serve or store LLM replies in the response cache")
+parser.add_argument("--test-coverage", type=str, default=None,
+                    help="JSON file mapping test classes to the classes they cover, used to select the tests of a changed class")
+parser.add_argument("--candidates", type=int, default=1,
+                    help="Number of improvements requested, compiled and tested in parallel (each in its own workspace) per attempt")
+parser.add_argument("--candidate-selection", choices=["first", "best"], default="first",
+                    help="Order in which passing candidates are judged: first generated, or best metrics (lowest WMC, then LOC)")
+parser.add_argument("--push-every", type=int, default=20, help="Push the accepted commits every N commits")
+parser.add_argument("--push-interval", type=float, default=300, help="Push pending commits at least every T seconds")
+parser.add_argument("--no-push", action="store_true", help="Only commit the accepted improvements locally")
+parser.add_argument("--render-graphs", action="store_true",
+                    help="Render the PNG of the dependency graphs once all classes are processed (see refAgent.render_graphs)")
+parser.add_argument("--files-manifest", action="store_true",
+                    help="Also write the list of Java files found to data/paths/<project>/<project>_files.json")
+parser.add_argument("--status", action="store_true", help="Print the progress recorded in the run journal and exit")
 args = parser.parse_args()
 
 protject_name = args.project_name
 
 config = Settings()
-# Example usage
-if __name__ == "__main__":
-
-    #Prepare needed folders
+designite_jar = "./code_smells/DesigniteJava.jar"  # Path to DesigniteJava.jar
+max_attempts = 5  # Improvements tried per class
+system_prompt = "You are a software developer, helpull and a java expert"
+
+# The shared after-project repository is not safe to use from several workers at once
+commit_lock = threading.Lock()
+# Set once the discovery walk has added every file of the project to the dependency index and the test selection is built
+index_ready = threading.Event()
+# Requests the instructions of the upcoming classes ahead of time when the asynchronous LLM client is used
+instruction_prefetcher = None
+
+def commit_improvement(workspace, commit_batcher, file, improvement, Before_java_code):
+    """
+    Commit an accepted improvement to the shared after-project repository. The commit is local,
+    the commit batcher pushes it later from its background thread.
+    """
+    repo_path = workspace.shared_after_project
+    file_path = workspace.relative_path(file)
+    commit_message = f'Your changing file {file_path}'
+
+    with commit_lock:
+        if workspace.shared:
+            commit_batcher.commit(file_path, commit_message)
+        else:
+            # Workers edit private copies, so bring the accepted code into the shared repository first
+            shared_file = os.path.join(repo_path, file_path)
+            write_to_java_file(file_path=shared_file, java_code=improvement)
+            commit_batcher.commit(file_path, commit_message)
+            write_to_java_file(file_path=shared_file, java_code=Before_java_code)
+
+def compute_designite_after_metrics(workspace, target_class, improvement):
+    """
+    Measure improved code with DesigniteJava in the workspace's scratch folders.
+    """
+    input_path = workspace.metrics_after_input  # Path to the Java code directory
+    output_path = workspace.metrics_after_output   # Path to store metrics
+
+    write_to_java_file(file_path=input_path+"/"+target_class+".java", java_code=improvement)
+
+    after_calculator = JavaMetricsCalculator(input_path, output_path, designite_jar)
+    after_metrics = after_calculator.compute_metrics_for_class()
+    after_calculator.clean_repository()
+    return after_metrics
+
+def instruction_query(Before_java_code, class_metrics):
+    return """
+        For each method in the provided Java class : 
+        {} 
+        
+        Return "Yes or No based on wether the method needs refactoring and improvement to enhance is readaoilty and maintainability clarity. and adherence to basic coding practices. . 
+        Ensure that your assessment considers the method's complexity, the class weighted Methods per class, the lack of cohesion of methods in the class.
+        
+        Class CKO metrics : 
+        {}
+
+        Provide your response in a json format as follow : 
+        {{
+        Method1: (yes, improvement instruction),
+        Method2: No,
+        Method3: (yes, improvement instruction)
+        }}
+
+        Avoid using natural lanquage explanation
+        """.format(Before_java_code, class_metrics)
+
+class InstructionPrefetcher:
+    def __init__(self, llm, journal, parse_cache, project_metrics, depth):
+        """
+        Request the instruction of the next classes while the current ones are refactored, so the
+        asynchronous LLM client keeps requests in flight instead of waiting for one class at a time.
+        :param llm: AsyncOpenAILLM sending the requests.
+        :param journal: Run journal, classes whose instruction is already recorded are not prefetched.
+        :param parse_cache: Parse cache giving the class names.
+        :param project_metrics: ProjectMetricsCalculator giving the metrics of the prompts.
+        :param depth: Number of classes after the current one whose instruction is requested ahead.
+        """
+        self.llm = llm
+        self.journal = journal
+        self.parse_cache = parse_cache
+        self.project_metrics = project_metrics
+        self.depth = depth
+        self.files = []
+        self.positions = {}
+        self.requests = {}
+        self._lock = threading.Lock()
+
+    def add(self, file):
+        """
+        Add a class in the order it is handed to the workers.
+        """
+        with self._lock:
+            self.positions[file] = len(self.files)
+            self.files.append(file)
+
+    def _submit(self, query):
+        return self.llm.submit(system_prompt, query, model=config.MODEL_NAME, raise_errors=True)
+
+    def _prefetch(self, file):
+        target_class = extract_class_name(file, parse_cache=self.parse_cache)
+        if target_class is None:
+            return None
+        Before_java_code = parse_java_code(file)
+        query = instruction_query(Before_java_code, self.project_metrics.class_as_string(target_class, Before_java_code, file))
+        return query, self._submit(query)
+
+    def instruction(self, file, query):
+        """
+        Return the instruction reply of a class, from its prefetched request if there is one, after
+        requesting the instruction of the classes following it.
+        """
+        with self._lock:
+            prefetched = self.requests.pop(file, None)
+            position = self.positions.get(file, len(self.files))
+            for next_file in self.files[position + 1:position + 1 + self.depth]:
+                if next_file in self.requests or self.journal.is_done(next_file) or self.journal.has(next_file, "instruction"):
+                    continue
+                self.requests[next_file] = self._prefetch(next_file)
+        if prefetched is not None and prefetched[0] == query:
+            return prefetched[1].result()
+        return self._submit(query).result()
+
+def select_tests(test_selector, target_class):
+    # Exactly the tests reaching the class through the project's references (or their coverage)
+    index_ready.wait()
+    tests = test_selector.tests_for(target_class)
+    if tests is None:
+        # Without a selection nothing can be skipped, an empty run would accept untested code
+        print(f"No test selection for {target_class}, running the full test suite")
+    return tests
+
+def evaluate_candidate(file, attempt, workspace, journal, generate, syntax_gate, build_backend, test_selector, target_class,
+                       Before_java_code):
+    """
+    Request one improvement, check it with the syntax gate, then compile and test it in a
+    workspace. A passing candidate is left in the workspace for the commit.
+    """
+    improvement = journal.run(file, "improvement", generate(attempt), iteration=attempt)
+    improvement = extract_code_block(improvement)
+    candidate = {"attempt": attempt, "workspace": workspace, "improvement": improvement, "rejection": None,
+                 "compiled": False, "test results": None}
+
+    # Truncated, non-Java or API-breaking replies are rejected in milliseconds instead of by Maven
+    candidate["rejection"] = journal.run(file, "syntax gate", lambda: syntax_gate.check(improvement), iteration=attempt)
+    if candidate["rejection"] is not None:
+        print(f"Candidate {attempt} rejected before compilation: {candidate['rejection']}")
+        return candidate
+
+    print(f"------------ Start making the improvement to compile and test Itteration {attempt}-----------------")
+    print(f"=============================================================================================")
+
+    path_to_java_file_after = workspace.after_file(file)
+    write_to_java_file(file_path=path_to_java_file_after, java_code=improvement)
+
+    print("-------------------- Compile the improved code ---------------------------------------")
+
+    project_directory = workspace.after_project
+    candidate["compiled"] = journal.run(file, "compile",
+                                        lambda: build_backend.compile(project_directory, changed_file=path_to_java_file_after),
+                                        iteration=attempt)
+    if candidate["compiled"] == False:
+        write_to_java_file(file_path=path_to_java_file_after, java_code=Before_java_code)
+        return candidate
+
+    print("------------ Test the improved code ---------------------------------------")
+    candidate["test results"] = journal.run(file, "test", lambda: build_backend.run_tests(select_tests(test_selector, target_class),
+                                                                                          project_directory), iteration=attempt)
+    if not candidate["test results"]["passed"]:
+        write_to_java_file(file_path=path_to_java_file_after, java_code=Before_java_code)
+    return candidate
+
+def evaluate_candidates(file, attempts, workspaces, journal, generate, syntax_gate, build_backend, test_selector, target_class,
+                        Before_java_code):
+    """
+    Evaluate the candidates of several attempts in parallel, one workspace each.
+    When a candidate raises, the candidates not started yet are cancelled and the error is raised
+    once the running ones have finished, so the caller can restore the workspaces.
+    :return: The candidates in attempt order.
+    """
+    if len(attempts) == 1:
+        return [evaluate_candidate(file, attempts[0], workspaces[0], journal, generate, syntax_gate, build_backend,
+                                   test_selector, target_class, Before_java_code)]
+    with ThreadPoolExecutor(max_workers=len(attempts)) as executor:
+        futures = [executor.submit(evaluate_candidate, file, attempt, workspace, journal, generate, syntax_gate,
+                                   build_backend, test_selector, target_class, Before_java_code)
+                   for attempt, workspace in zip(attempts, workspaces)]
+        done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+        if not_done:
+            for future in not_done:
+                future.cancel()
+            wait(not_done)
+            # Raise the error of the failed candidate rather than a cancellation
+            for future in futures:
+                if future in done and future.exception() is not None:
+                    raise future.exception()
+        return [future.result() for future in futures]
+
+def candidate_score(improvement, ast_metrics):
+    """
+    Sort key of a candidate in "best" selection: total WMC, then total LOC, of its types.
+    """
+    try:
+        metrics = ast_metrics.compute_metrics_for_code(improvement)
+    except (javalang.parser.JavaSyntaxError, javalang.tokenizer.LexerError):
+        return (float("inf"), float("inf"))
+    class_metrics = [data["Class Metrics"] for data in metrics.values()]
+    return (sum(m["Weighted Methods per Class (WMC)"] for m in class_metrics),
+            sum(m["Lines of Code (LOC)"] for m in class_metrics))
+
+def write_candidate_results(target_class, Before_java_code, improvement):
+    #Write the improved code in the results file
+    write_to_java_file(file_path=f"results/{protject_name}/{target_class}/original_java_code.java", java_code=Before_java_code)
+    write_to_java_file(file_path=f"results/{protject_name}/{target_class}/improved_java_code.java", java_code=improvement)
+
+def refactor_class(file, workspaces, journal, llm, test_selector, parse_cache, build_backend, commit_batcher, project_metrics,
+                   ast_metrics):
+    """
+    Refactor one class. Every completed stage is recorded in the run journal and replayed from
+    it when the class is resumed, so an interrupted class continues where it stopped.
+    With several workspaces, each attempt evaluates one candidate per workspace in parallel.
+    """
     results = {}
-    os.makedirs(f"results/{protject_name}", exist_ok=True)
-    os.makedirs(f"data/paths/{protject_name}", exist_ok=True)
-
-    #Identify the .java files in  REPO
-    export_java_files_to_json(f"projects/before/{protject_name}", f"data/paths/{protject_name}/{protject_name}_files.json")
-    files = read_json_file(f"data/paths/{protject_name}/{protject_name}_files.json")
-    files = find_non_test_files(files)
-    for file in files:
+    target_class = extract_class_name(file, parse_cache=parse_cache)
+
+    if target_class == None:
+        journal.record(file, "done", results)
+        return
+    os.makedirs(f"results/{protject_name}/{target_class}", exist_ok=True)
+
+    # The metrics of the original project are computed once for all classes
+    Before_java_code = parse_java_code(file)
+    before_metrics = journal.run(file, "before metrics", lambda: project_metrics.metrics_for_class(target_class, Before_java_code, file))
+
+    #Export the CKO metrics of the original class to results folder
+    results["CKO metrics"] = before_metrics
+
+    prompt = system_prompt
+    query = instruction_query(Before_java_code, project_metrics.class_as_string(target_class, Before_java_code, file))
+    if instruction_prefetcher is not None:
+        # The reply may already be in flight, requested while an earlier class was being refactored
+        Instruction = journal.run(file, "instruction", lambda: instruction_prefetcher.instruction(file, query))
+    else:
+        Instruction = journal.run(file, "instruction", lambda: llm.query_llm(prompt, query, model=config.MODEL_NAME, raise_errors=True))
+    results["Instruction"] = Instruction
+
+    #Decision Node
+    query_decisition = """
+            Output: True or false
+
+            From this set of instructoin to improve all these methods does as least one method need improvement:
+
+            Instruction: {}
+
+            Don't return any natural language explanation
+            """.format(Instruction)
+    do_instrect = journal.run(file, "decision", lambda: llm.query_llm(prompt, query_decisition, model=config.MODEL_NAME, raise_errors=True))
+    
+    if do_instrect:   
+
+        query = """
+                    Following the instruction Instructions:{}  and CKO metrics {} and dependent calsses, improve the provided java code {} and improve the
+                    CKO metrics. You can assume that the given class and methods are functionally correct. Ensure that you do not
+                    Alter the behaviour of the external method while maintaining the behaviour of the method, maintaining both syntactic
+                    and semantic corectness. Don't remove any comments or annotations.
+                    Provide the java class within code block. Avoid using natural langiage explanations
+                    """.format(Instruction, before_metrics,Before_java_code)
+
+        def generate(attempt):
+            # Retries resend the same prompt to sample a different improvement, so only the first attempt is cached
+            return lambda: llm.query_llm(prompt, query, model=config.MODEL_NAME, use_cache=(attempt == 0),
+                                 raise_errors=True)
+
+        # Candidates are generated, compiled and tested a batch at a time, one per workspace
+        syntax_gate = SyntaxGate(Before_java_code)
+        candidates_count = {"attempted": 0, "rejected": 0, "compiled": 0, "passed tests": 0, "accepted": 0}
+        rejections = []
+        attempt = 0
         try:
-            project_directory = f"projects/before/{protject_name}"
-            target_class = extract_class_name(file)
-            class_directory = os.path.dirname(file)
-
-            if target_class == None:
-                continue
-            os.makedirs(f"results/{protject_name}/{target_class}", exist_ok=True)
-
-            graph_path = f"data/graphs/{protject_name}/{target_class}_dependency_graph.json"
-            
-            analyzer = JavaClassDependencyAnalyzer(target_class)
-            analyzer.analyze_project(project_directory)
-            analyzer.export_to_json(graph_path)
-            draw_dependency_graph(analyzer.dependencies, filename=f"data/graphs/{protject_name}/{target_class}_dependency_graph.png")
-            
-            # 1. For a single file
-            input_path = "code_smells/project/before"  # Path to the Java code directory
-            output_path = "./code_smells/tmp/before"   # Path to store metrics
-            designite_jar = "./code_smells/DesigniteJava.jar"  # Path to DesigniteJava.jar
-
-            copy_file(class_directory, input_path, target_class+".java")
-
-            before_calculator = JavaMetricsCalculator(input_path, output_path, designite_jar)
-            before_calculator.parse_java_code(file)
-            before_metrics = before_calculator.compute_metrics_for_class()
-            before_calculator.clean_repository()
-
-            path_to_java_file = file
-            path_to_java_file_after = path_to_java_file.replace("before","after")
-
-            Before_java_code = before_calculator.java_code
-
-            #Export the CKO metrics of the original class to results folder
-            results["CKO metrics"] = before_metrics
-
-            # Example usage:
-            api_key = config.API_KEY
-            llm = OpenAILLM(api_key)
-            prompt = "You are a software developer, helpull and a java expert"
-
-            query = """
-                For each method in the provided Java class : 
-                {} 
-                
-                Return "Yes or No based on wether the method needs refactoring and improvement to enhance is readaoilty and maintainability clarity. and adherence to basic coding practices. . 
-                Ensure that your assessment considers the method's complexity, the class weighted Methods per class, the lack of cohesion of methods in the class.
-                
-                Class CKO metrics : 
-                {}
-
-                Provide your response in a json format as follow : 
-                {{
-                Method1: (yes, improvement instruction),
-                Method2: No,
-                Method3: (yes, improvement instruction)
-                }}
-
-                Avoid using natural lanquage explanation
-                """.format(before_calculator.java_code, before_calculator.as_string())
-                
-            Instruction = llm.query_llm(prompt, query, model=config.MODEL_NAME)
-            results["Instruction"] = Instruction
-
-            #Decision Node
-            query_decisition = """
-                    Output: True or false
-
-                    From this set of instructoin to improve all these methods does as least one method need improvement:
-
-                    Instruction: {}
-
-                    Don't return any natural language explanation
-                    """.format(Instruction)
-            do_instrect = llm.query_llm(prompt, query_decisition, model=config.MODEL_NAME)
-            
-            if do_instrect:   
-
-                for i in range(5): 
-                    query = """
-                            Following the instruction Instructions:{}  and CKO metrics {} and dependent calsses, improve the provided java code {} and improve the
-                            CKO metrics. You can assume that the given class and methods are functionally correct. Ensure that you do not
-                            Alter the behaviour of the external method while maintaining the behaviour of the method, maintaining both syntactic
-                            and semantic corectness. Don't remove any comments or annotations.
-                            Provide the java class within code block. Avoid using natural langiage explanations
-                            """.format(Instruction, before_metrics,Before_java_code)
-                    improvement = llm.query_llm(prompt, query, model=config.MODEL_NAME)
-                    improvement = improvement.replace("```java", "").replace("```", "")
-
-                    print(f"------------ Start making the improvement to compile and test Itteration {i}-----------------")
-                    print(f"=============================================================================================")
-
-                    write_to_java_file(file_path=path_to_java_file_after, java_code=improvement)
-
-                    #Write the improved code in the results file
-                    write_to_java_file(file_path=f"results/{protject_name}/{target_class}/original_java_code.java", java_code=Before_java_code)
-                    write_to_java_file(file_path=f"results/{protject_name}/{target_class}/improved_java_code.java", java_code=improvement)
-
-
-                    print("-------------------- Compile the improved code ---------------------------------------")
-
-                    project_directory = f"projects_after/{protject_name}"
-                    is_compiled = compile_project_with_maven(project_directory)
-                    if is_compiled == False:
+            while attempt < max_attempts and not results.get("is improved"):
+                attempts = range(attempt, min(attempt + len(workspaces), max_attempts))
+                candidates = evaluate_candidates(file, attempts, workspaces, journal, generate, syntax_gate, build_backend,
+                                                 test_selector, target_class, Before_java_code)
+                attempt = attempts.stop
+
+                passing = []
+                for candidate in candidates:
+                    candidates_count["attempted"] += 1
+                    if candidate["rejection"] is not None:
+                        candidates_count["rejected"] += 1
+                        rejections.append({"attempt": candidate["attempt"], "reason": candidate["rejection"]})
+                        results["Compilation"] = False
+                        results["Test passed"] = False
+                        results["is improved"] = False
+                    elif not candidate["compiled"]:
                         results["Compilation"] = False
                         results["Test passed"] = False
                         results["is improved"] = False 
-                        write_to_java_file(file_path=path_to_java_file_after, java_code=Before_java_code)
+                    elif not candidate["test results"]["passed"]:
+                        candidates_count["compiled"] += 1
+                        results["Compilation"] = True
+                        results["Test passed"] = False
+                        results["is improved"] = False
+                        results["Failed tests"] = candidate["test results"]["failures"]
+                    else:
+                        candidates_count["compiled"] += 1
+                        candidates_count["passed tests"] += 1
+                        passing.append(candidate)
                         continue
-
-                    print("------------ Test the improved code ---------------------------------------")
-                    graph_dep = read_json_file(graph_path)
-                    files = extract_ids(graph_dep)
-                    tests = find_test_files(files)
-                    for test in tests:
-                        if test!="TestCase":
-                            rcode = run_maven_test(test, project_dir=project_directory, verify=False)
-                            if rcode.returncode != 0:
-                                results["Compilation"] = True
-                                results["Test passed"] = False
-                                results["is improved"] = False
-                                continue  
+                    write_candidate_results(target_class, Before_java_code, candidate["improvement"])
+                if args.candidate_selection == "best":
+                    passing.sort(key=lambda candidate: candidate_score(candidate["improvement"], ast_metrics))
+
+                for candidate in passing:
+                    i = candidate["attempt"]
+                    workspace = candidate["workspace"]
+                    improvement = candidate["improvement"]
+                    write_candidate_results(target_class, Before_java_code, improvement)
                     print("------------- Commit the code changes to github-------------------")
 
-                    repo_path = f'projects/after/{protject_name}'
-                    file_path = file.replace(f"projects/before/{protject_name}/", "")
-
-                    commit_message = f'Your changing file {file_path}'
-                    commit_file_to_github(repo_path, file_path, commit_message)   
+                    if not journal.has(file, "commit", iteration=i):
+                        commit_improvement(workspace, commit_batcher, file, improvement, Before_java_code)
+                        journal.record(file, "commit", iteration=i)
 
                     #Compute CKO metrics
-                    # 1. For a single file
-                    # 1. For a single file
-                    input_path = "code_smells/project/after"  # Path to the Java code directory
-                    output_path = "./code_smells/tmp/after"   # Path to store metrics
-
-                    write_to_java_file(file_path=input_path+"/"+target_class+".java", java_code=improvement)
-
-
-                    after_calculator = JavaMetricsCalculator(input_path, output_path, designite_jar)
-                    after_calculator.parse_java_code(file)
-                    after_metrics = before_calculator.compute_metrics_for_class()
-                    after_calculator.clean_repository()
+                    measured_with_ast = False
+                    if args.metrics_engine == "ast":
+                        # In-process metrics for the judge, DesigniteJava only measures the accepted code
+                        try:
+                            judge_before_metrics = ast_metrics.compute_metrics_for_code(Before_java_code)
+                            after_metrics = ast_metrics.compute_metrics_for_code(improvement)
+                            measured_with_ast = True
+                        except (javalang.parser.JavaSyntaxError, javalang.tokenizer.LexerError):
+                            pass
+                    if not measured_with_ast:
+                        judge_before_metrics = before_metrics
+                        after_metrics = journal.run(file, "after metrics",
+                                                    lambda: compute_designite_after_metrics(workspace, target_class, improvement), iteration=i)
 
                     # Check there was an improvement
-                    query = """
-                            Given the Java code before and after the proposed changes, along with their corresponding CKO metrics, 
-                            assess whether the code has improved. Analyze both versions of the code and compare the CKO metrics.
-                            Determine if the changes resulted in better code quality, readability, maintainability, and performance.
-                            Java code before improvement :{}
-                            CKO metrics before improvement : {}
-                            
-                            Java code after Improvement: {}
-                            CKO metrics after Improvement: {}
-
-                            Return True or False.
-                            Avoid using natural lanquage explanation
-                            """.format(Before_java_code, after_metrics,improvement, after_metrics)
+                    query_judge = """
+                    Given the Java code before and after the proposed changes, along with their corresponding CKO metrics, 
+                    assess whether the code has improved. Analyze both versions of the code and compare the CKO metrics.
+                    Determine if the changes resulted in better code quality, readability, maintainability, and performance.
+                    Java code before improvement :{}
+                    CKO metrics before improvement : {}
                     
-                    is_improvement = llm.query_llm(prompt, query, model=config.MODEL_NAME)
+                    Java code after Improvement: {}
+                    CKO metrics after Improvement: {}
+
+                    Return True or False.
+                    Avoid using natural lanquage explanation
+                    """.format(Before_java_code, judge_before_metrics,improvement, after_metrics)
+                
+                    is_improvement = journal.run(file, "judge", lambda: llm.query_llm(prompt, query_judge, model=config.MODEL_NAME,
+                                                                                            raise_errors=True), iteration=i)
                     if is_improvement ==False:
                         results["Compilation"] = True
                         results["Test passed"] = True
                         results["is improved"] = False
                         continue
-                            
+                        
                     results["Compilation"] = True
                     results["Test passed"] = True
                     results["is improved"] = True
+                    if measured_with_ast:
+                        after_metrics = journal.run(file, "after metrics",
+                                                    lambda: compute_designite_after_metrics(workspace, target_class, improvement), iteration=i)
                     results["CKO metrics After"] = after_metrics
+                    candidates_count["accepted"] += 1
 
                     break
-                
-                write_to_java_file(file_path=path_to_java_file_after, java_code=Before_java_code)
-                export_dict_to_json(results, f"results/{protject_name}/{target_class}/metrics")
-        except:
-            continue
-            
-
-
-
-
-
+        finally:
+            # Whatever happened to the candidates (rejected, failed, or an error raised by the LLM or the build),
+            # the next classes are compiled and tested against the original code
+            for workspace in workspaces:
+                write_to_java_file(file_path=workspace.after_file(file), java_code=Before_java_code)
+
+        results["Candidates"] = candidates_count
+        if rejections:
+            results["Syntax gate rejections"] = rejections
+        export_dict_to_json(results, f"results/{protject_name}/{target_class}/metrics")
+    journal.record(file, "done", results)
+
+def process_file(file, workspace_pool, journal, *services):
+    if journal.is_done(file):
+        return
+    with workspace_pool.workspace_group(args.candidates) as workspaces:
+        try:
+            refactor_class(file, workspaces, journal, *services)
+        except Exception as e:
+            # Recorded so the status shows it, the class is retried from its last completed stage on the next run
+            journal.record(file, "failed", f"{type(e).__name__}: {e}")
+            print(f"Refactoring {file} failed: {e}")
 
+# Example usage
+if __name__ == "__main__":
 
+    #Prepare needed folders
+    os.makedirs(f"results/{protject_name}", exist_ok=True)
+    os.makedirs(f"data/paths/{protject_name}", exist_ok=True)
 
-        
+    if args.status:
+        # Answered from the journal and, when one was written, the files manifest, without walking any tree
+        files_json = f"data/paths/{protject_name}/{protject_name}_files.json"
+        total = len(find_non_test_files(read_json_file(files_json))) if os.path.exists(files_json) else None
+        journal = RunJournal(f"results/{protject_name}/run_journal.jsonl")
+        print(journal.as_string(total=total))
+        journal.close()
+        sys.exit(0)
+
+    journal = RunJournal(f"results/{protject_name}/run_journal.jsonl")
+
+    #The dependency index is filled by the discovery walk below, then gives the test selection and the project graph
+    project_directory = f"projects/before/{protject_name}"
+    parse_cache = ParseCache("data/cache/parse_cache.sqlite")
+    dependency_index = JavaProjectDependencyIndex(parse_cache=parse_cache)
+    coverage = TestSelector.load_coverage(args.test_coverage) if args.test_coverage else None
+    test_selector = TestSelector(dependency_index, coverage=coverage)
+
+    #Compute the metrics of the original project in a single DesigniteJava pass
+    project_metrics = ProjectMetricsCalculator(project_directory, f"code_smells/{protject_name}/before", designite_jar)
+    project_metrics.compute_project_metrics()
+    ast_metrics = ASTMetricsCalculator(parse_cache)
+
+
+    # Example usage:
+    api_key = config.API_KEY
+    llm_cache = None if args.no_llm_cache else LLMResponseCache("data/cache/llm_cache.sqlite")
+    if args.llm_concurrency > 0:
+        llm = AsyncOpenAILLM(api_key, max_concurrency=args.llm_concurrency, cache=llm_cache)
+    else:
+        llm = OpenAILLM(api_key, cache=llm_cache)
+
+    if args.llm_concurrency > 0:
+        instruction_prefetcher = InstructionPrefetcher(llm, journal, parse_cache, project_metrics, depth=args.llm_concurrency)
+
+    #Give every worker its own scratch folders and copy of the after-project
+    workspace_pool = WorkspacePool(protject_name, workers=args.workers * args.candidates, mode=args.workspace_mode)
+    build_backend = create_build_backend(args.build_backend, compile_mode=args.compile_mode, executable=args.build_executable,
+                                         fail_fast=not args.no_fail_fast, fork_count=args.test_fork_count)
+    build_backend.start(workspace_pool.workspaces[0].after_project)
+    commit_batcher = CommitBatcher(workspace_pool.workspaces[0].shared_after_project, push_every=args.push_every,
+                                   push_interval=args.push_interval, push=not args.no_push)
+
+    #Identify the .java files in REPO, index every file and hand the classes to the workers as they are found
+    manifest_file = f"data/paths/{protject_name}/{protject_name}_files.json" if args.files_manifest else None
+    files = []
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        try:
+            for file, is_test in discover_java_files(project_directory, manifest_file=manifest_file):
+                dependency_index.add_java_file(file)
+                if is_test:
+                    continue
+                files.append(file)
+                if instruction_prefetcher is not None:
+                    instruction_prefetcher.add(file)
+                executor.submit(process_file, file, workspace_pool, journal, llm, test_selector, parse_cache, build_backend,
+                                commit_batcher, project_metrics, ast_metrics)
+            test_selector.build()
+            print(test_selector.as_string())
+            # One compact graph file for the whole project, the dependency graph of a class is a slice of it
+            ProjectGraph.from_index(dependency_index).save(f"data/graphs/{protject_name}/project_graph.bin")
+        except Exception as e:
+            # Recorded before the workers are released, so they do not take the unbuilt selection for the real one
+            test_selector.fail(e)
+            raise
+        finally:
+            index_ready.set()
+    build_backend.close()
+    commit_batcher.close()
+    print(commit_batcher.as_string())
+    workspace_pool.cleanup()
+    if args.llm_concurrency > 0:
+        llm.close()
+
+    print(parse_cache.as_string())
+    parse_cache.close()
+    if llm_cache is not None:
+        print(llm_cache.as_string())
+        llm_cache.close()
+    print(journal.as_string(total=len(files)))
+    journal.close()
+
+    if args.render_graphs:
+        from refAgent.render_graphs import render_graphs
+        render_graphs(f"data/graphs/{protject_name}/project_graph.bin")
@@ -0,0 +1,226 @@
+import argparse
+import bisect
+import os
+import random
+import javalang
+from refAgent.java_metrics_calculator import JavaMetricsCalculator, ProjectMetricsCalculator
+
+# Bump when the computed metrics change so cached values are recomputed
+METRICS_VERSION = 1
+
+# Statements and expressions adding a decision point to the cyclomatic complexity
+DECISION_NODES = (
+    javalang.tree.IfStatement,
+    javalang.tree.ForStatement,
+    javalang.tree.WhileStatement,
+    javalang.tree.DoStatement,
+    javalang.tree.CatchClause,
+    javalang.tree.TernaryExpression,
+)
+
+class ASTMetricsCalculator:
+    def __init__(self, parse_cache=None):
+        """
+        Compute the DesigniteJava method and type metrics (CC, LOC, PC, NOF, NOPF, NOM, NOPM,
+        WMC and LCOM) directly from the javalang tree, without launching a JVM.
+        :param parse_cache: Optional ParseCache memoizing the metrics by file content.
+        """
+        self.parse_cache = parse_cache
+
+    def compute_metrics_for_code(self, java_code):
+        """
+        Compute the metrics of every type declared in Java source code.
+        :return: A dictionary in the format of JavaMetricsCalculator.compute_metrics_for_class.
+        """
+        if self.parse_cache is not None:
+            return self.parse_cache.cached_for_code(f"metrics:v{METRICS_VERSION}", java_code, self._compute)
+        return self._compute(java_code)
+
+    def compute_metrics_for_class(self, file_path):
+        with open(file_path, 'r', encoding='utf-8') as f:
+            java_code = f.read()
+        return self.compute_metrics_for_code(java_code)
+
+    def as_string(self, metrics):
+        """
+        Return metrics computed by this class as a formatted string, like JavaMetricsCalculator.as_string.
+        """
+        return JavaMetricsCalculator._format_metrics({
+            class_name: {"class_metrics": data["Class Metrics"], "methods": data["Method Metrics"]}
+            for class_name, data in metrics.items()
+        })
+
+    def _compute(self, java_code):
+        tree = javalang.parse.parse(java_code)
+        tokens = list(javalang.tokenizer.tokenize(java_code))
+        positions = [(token.position.line, token.position.column) for token in tokens]
+
+        final_metrics = {}
+        for path, node in tree.filter(javalang.tree.TypeDeclaration):
+            methods = list(node.constructors if hasattr(node, 'constructors') else []) + list(node.methods)
+            fields = [declarator.name for field in node.fields for declarator in field.declarators]
+            public_fields = sum(len(field.declarators) for field in node.fields if 'public' in field.modifiers)
+
+            method_metrics = []
+            for method in methods:
+                method_metrics.append({
+                    "Method Name": method.name,
+                    "Cyclomatic Complexity (CC)": self._cyclomatic_complexity(method),
+                    "Lines of Code (LOC)": self._lines_of_code(method, tokens, positions),
+                    "Parameter Count (PC)": len(method.parameters)
+                })
+
+            final_metrics[node.name] = {
+                "Class Metrics": {
+                    "Number of Fields (NOF)": len(fields),
+                    "Number of Public Fields (NOPF)": public_fields,
+                    "Number of Methods (NOM)": len(methods),
+                    "Number of Public Methods (NOPM)": sum(1 for method in methods if 'public' in method.modifiers),
+                    "Lines of Code (LOC)": self._lines_of_code(node, tokens, positions),
+                    "Weighted Methods per Class (WMC)": sum(m["Cyclomatic Complexity (CC)"] for m in method_metrics),
+                    "Lack of Cohesion of Methods (LCOM)": self._lack_of_cohesion(methods, fields)
+                },
+                "Method Metrics": method_metrics
+            }
+        return final_metrics
+
+    @staticmethod
+    def _cyclomatic_complexity(method):
+        complexity = 1
+        for path, node in method:
+            if isinstance(node, DECISION_NODES):
+                complexity += 1
+            elif isinstance(node, javalang.tree.SwitchStatementCase):
+                complexity += sum(1 for case in node.case if case != 'default')
+        return complexity
+
+    @staticmethod
+    def _lines_of_code(node, tokens, positions):
+        """
+        Count the lines from the start of a declaration to its closing brace (or semicolon).
+        """
+        if node.position is None:
+            return 0
+        index = bisect.bisect_left(positions, (node.position.line, node.position.column))
+        depth = 0
+        for token in tokens[index:]:
+            if depth == 0 and token.value == ';':
+                return token.position.line - node.position.line + 1
+            if token.value == '{':
+                depth += 1
+            elif token.value == '}':
+                depth -= 1
+                if depth == 0:
+                    return token.position.line - node.position.line + 1
+        return 1
+
+    @staticmethod
+    def _lack_of_cohesion(methods, fields):
+        """
+        LCOM as the number of connected components of the method/field access graph divided by
+        the number of methods, or -1 when the type has no methods or no fields.
+        """
+        if not methods or not fields:
+            return -1.0
+
+        field_names = set(fields)
+        method_names = {method.name for method in methods}
+        parent = {}
+
+        def find(item):
+            parent.setdefault(item, item)
+            while parent[item] != item:
+                parent[item] = parent[parent[item]]
+                item = parent[item]
+            return item
+
+        def union(a, b):
+            parent[find(a)] = find(b)
+
+        for index, method in enumerate(methods):
+            method_key = ('method', index)
+            find(method_key)
+            for path, node in method:
+                if isinstance(node, javalang.tree.MemberReference) and node.member in field_names \
+                        and node.qualifier in (None, '', 'this'):
+                    union(method_key, ('field', node.member))
+                elif isinstance(node, javalang.tree.MethodInvocation) and node.member in method_names \
+                        and node.qualifier in (None, ''):
+                    for other_index, other in enumerate(methods):
+                        if other.name == node.member:
+                            union(method_key, ('method', other_index))
+
+        components = {find(('method', index)) for index in range(len(methods))}
+        return len(components) / len(methods)
+
+
+def cross_check_with_designite(project_dir, designite_output, sample_size=30, seed=0, parse_cache=None):
+    """
+    Compare the metrics of the AST engine with the DesigniteJava outputs of a project on a
+    random sample of classes.
+    :param project_dir: Root folder of the project analysed by DesigniteJava.
+    :param designite_output: Folder holding the DesigniteJava CSV outputs of the project.
+    :param sample_size: Number of Java files to compare.
+    :param seed: Seed of the sampling.
+    :return: Dictionary mapping each metric to its agreement rate and the differing values.
+    """
+    designite = ProjectMetricsCalculator(project_dir, designite_output, None)
+    designite.parse_metrics()
+    engine = ASTMetricsCalculator(parse_cache)
+
+    java_files = []
+    for root, dirs, files in os.walk(project_dir):
+        java_files.extend(os.path.join(root, file) for file in files if file.endswith(".java"))
+    random.Random(seed).shuffle(java_files)
+
+    report = {}
+    compared = 0
+    for file_path in java_files:
+        if compared >= sample_size:
+            break
+        with open(file_path, 'r', encoding='utf-8') as f:
+            java_code = f.read()
+        try:
+            ast_metrics = engine.compute_metrics_for_code(java_code)
+        except (javalang.parser.JavaSyntaxError, javalang.tokenizer.LexerError):
+            continue
+        compared += 1
+
+        for class_name, metrics in ast_metrics.items():
+            reference = designite.metrics_for_class(class_name, java_code, file_path).get(class_name)
+            if reference is None:
+                continue
+            pairs = [(name, value, reference["Class Metrics"].get(name))
+                     for name, value in metrics["Class Metrics"].items()]
+            reference_methods = {}
+            for method in reference["Method Metrics"]:
+                reference_methods.setdefault(method["Method Name"], method)
+            for method in metrics["Method Metrics"]:
+                reference_method = reference_methods.get(method["Method Name"])
+                if reference_method is not None:
+                    pairs.extend((name, value, reference_method.get(name))
+                                 for name, value in method.items() if name != "Method Name")
+
+            for name, value, expected in pairs:
+                entry = report.setdefault(name, {"compared": 0, "equal": 0, "differences": []})
+                entry["compared"] += 1
+                if expected is not None and abs(float(value) - float(expected)) < 1e-6:
+                    entry["equal"] += 1
+                else:
+                    entry["differences"].append({"class": class_name, "ast": value, "designite": expected})
+
+    for entry in report.values():
+        entry["agreement"] = entry["equal"] / entry["compared"] if entry["compared"] > 0 else 0
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cross-check the AST metrics engine against DesigniteJava outputs")
+    parser.add_argument("project_dir", type=str, help="Root folder of the Java project")
+    parser.add_argument("designite_output", type=str, help="Folder with methodMetrics.csv and typeMetrics.csv of the project")
+    parser.add_argument("--sample-size", type=int, default=30, help="Number of Java files to compare")
+    args = parser.parse_args()
+
+    report = cross_check_with_designite(args.project_dir, args.designite_output, sample_size=args.sample_size)
+    for name, entry in report.items():
+        print(f"{name}: {entry['agreement']:.1%} of {entry['compared']} values agree")
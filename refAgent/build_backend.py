@@ -0,0 +1,101 @@
+import shlex
+import shutil
+import subprocess
+import tempfile
+from utilities import compile_project_with_maven, run_maven_test, run_maven_tests
+
+class SubprocessBuildBackend:
+    def __init__(self, compile_mode="incremental", executable="mvn", fail_fast=True, fork_count=None):
+        """
+        Build backend running a new Maven process for every compile and test request.
+        :param compile_mode: Compilation mode passed to compile_project_with_maven.
+        :param executable: Maven command to run.
+        :param fail_fast: Stop a test run after the first failing test.
+        :param fork_count: Number of surefire forks running test classes in parallel.
+        """
+        self.compile_mode = compile_mode
+        self.executable = executable
+        self.fail_fast = fail_fast
+        self.fork_count = fork_count
+
+    def start(self, project_dir=None):
+        pass
+
+    def compile(self, project_dir, changed_file=None):
+        """
+        Compile the project.
+        :return: True if the compilation succeeded.
+        """
+        return compile_project_with_maven(project_dir, changed_file=changed_file, mode=self.compile_mode,
+                                          maven_executable=self.executable)
+
+    def test(self, test_class, project_dir):
+        """
+        Run one test class.
+        :return: The completed process of the test run.
+        """
+        return run_maven_test(test_class, project_dir=project_dir, verify=False, maven_executable=self.executable)
+
+    def run_tests(self, test_classes, project_dir):
+        """
+        Run several test classes in one Maven invocation (the full test suite when test_classes is None).
+        :return: The result dictionary of run_maven_tests.
+        """
+        return run_maven_tests(test_classes, project_dir=project_dir, fail_fast=self.fail_fast,
+                               fork_count=self.fork_count, maven_executable=self.executable)
+
+    def close(self):
+        pass
+
+
+class MavenDaemonBackend(SubprocessBuildBackend):
+    def __init__(self, compile_mode="incremental", executable="mvnd", fail_fast=True, fork_count=None, daemon_storage=None):
+        """
+        Build backend sending compile and test requests to the Maven daemon (mvnd), which keeps
+        warm JVMs with the plugins and project models loaded for the whole run.
+        Falls back to plain mvn when the daemon client is not installed.
+        :param compile_mode: Compilation mode passed to compile_project_with_maven.
+        :param executable: Daemon client command (can point to a local stand-in for testing).
+        :param fail_fast: Stop a test run after the first failing test.
+        :param fork_count: Number of surefire forks running test classes in parallel.
+        :param daemon_storage: Folder of the daemon registry of this run (a temporary folder by default).
+                               The daemons registered there are the only ones stopped on close.
+        """
+        super().__init__(compile_mode=compile_mode, executable=executable, fail_fast=fail_fast, fork_count=fork_count)
+        self.daemon_storage = daemon_storage
+        self._own_storage = False
+
+    def start(self, project_dir=None):
+        """
+        Check the daemon client and warm a daemon up on the project, so the first request does not pay the startup.
+        """
+        if shutil.which(self.executable) is None:
+            print(f"{self.executable} not found, falling back to mvn subprocesses.")
+            self.executable = "mvn"
+            return
+        if self.daemon_storage is None:
+            self.daemon_storage = tempfile.mkdtemp(prefix="refagent-mvnd-")
+            self._own_storage = True
+        # Every request of the run goes to the daemons of this registry, never to the ones of other users or runs
+        self.executable = f"{self.executable} -Dmvnd.daemonStorage={shlex.quote(self.daemon_storage)}"
+        if project_dir is not None:
+            print("Warming up the Maven daemon...")
+            subprocess.run(f"{self.executable} -q validate", shell=True, cwd=project_dir, capture_output=True, text=True)
+
+    def close(self):
+        if self.daemon_storage is not None and self.executable != "mvn":
+            # Stops the daemons of this run's registry only
+            subprocess.run(f"{self.executable} --stop", shell=True, capture_output=True, text=True)
+            if self._own_storage:
+                shutil.rmtree(self.daemon_storage, ignore_errors=True)
+
+
+def create_build_backend(name="mvn", compile_mode="incremental", executable=None, fail_fast=True, fork_count=None):
+    """
+    Create the build backend with the given name ("mvn" or "mvnd").
+    """
+    if name == "mvnd":
+        return MavenDaemonBackend(compile_mode=compile_mode, executable=executable or "mvnd",
+                                  fail_fast=fail_fast, fork_count=fork_count)
+    return SubprocessBuildBackend(compile_mode=compile_mode, executable=executable or "mvn",
+                                  fail_fast=fail_fast, fork_count=fork_count)
@@ -0,0 +1,154 @@
+import os
+import threading
+import time
+import git
+from git import PushInfo
+
+PUSH_FAILURE_FLAGS = PushInfo.ERROR | PushInfo.REJECTED | PushInfo.REMOTE_REJECTED | PushInfo.REMOTE_FAILURE
+
+class CommitBatcher:
+    def __init__(self, repo_path, branch='main', remote='origin', push_every=20, push_interval=300,
+                 retry_delay=30, max_retry_delay=600, push=True):
+        """
+        Commit accepted changes locally through one repository handle for the whole run and push
+        them from a background thread, every push_every commits or push_interval seconds.
+        Failed pushes are retried with an exponential backoff without blocking the committers.
+        :param repo_path: Path to the local repository.
+        :param branch: Remote branch receiving the commits.
+        :param remote: Name of the remote.
+        :param push_every: Number of unpushed commits triggering a push.
+        :param push_interval: Maximum number of seconds between pushes of pending commits.
+        :param retry_delay: Seconds before retrying a failed push (doubled after every failure).
+        :param max_retry_delay: Upper bound of the retry delay in seconds.
+        :param push: Only commit locally when False.
+        """
+        self.repo_path = repo_path
+        self.repo = git.Repo(repo_path)
+        self.branch = branch
+        self.remote = remote
+        self.push_every = push_every
+        self.push_interval = push_interval
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.push_enabled = push
+
+        self.commits = 0
+        # Commits left unpushed by a previous run are pushed with the new ones
+        self.unpushed = self.pending_commits() or 0
+        self.pushes = 0
+        self.push_failures = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = None
+        if push:
+            self._thread = threading.Thread(target=self._run, name="commit-batcher", daemon=True)
+            self._thread.start()
+
+    def commit(self, file_path, commit_message):
+        """
+        Stage one file of the repository and commit it locally.
+        :param file_path: Path of the file relative to the repository root.
+        :param commit_message: Message of the commit.
+        :return: The hexsha of the commit, or None if it failed.
+        """
+        full_file_path = os.path.join(self.repo_path, file_path)
+        if not os.path.exists(full_file_path):
+            print(f"An error occurred: File {file_path} not found in the repository.")
+            return None
+        with self._lock:
+            try:
+                self.repo.index.add([file_path])
+                commit = self.repo.index.commit(commit_message)
+            except Exception as e:
+                print(f"An error occurred: {str(e)}")
+                return None
+            self.commits += 1
+            self.unpushed += 1
+            if self.unpushed >= self.push_every:
+                self._wake.set()
+        print(f"Committed {file_path} with message: {commit_message}")
+        return commit.hexsha
+
+    def pending_commits(self, head="HEAD"):
+        """
+        Number of commits of head missing from the remote branch, as last seen by the repository.
+        :return: The number of commits, or None when the remote branch is not known locally.
+        """
+        try:
+            return int(self.repo.git.rev_list("--count", f"{self.remote}/{self.branch}..{head}"))
+        except git.GitCommandError:
+            return None
+
+    def push(self):
+        """
+        Push the local commits missing from the remote branch, including the ones of previous runs.
+        :return: True if there was nothing to push or the push succeeded.
+        """
+        with self._lock:
+            # Push a snapshot of the head, so commits made during the push are not affected
+            head = self.repo.head.commit.hexsha
+            committed = self.unpushed
+        pending = self.pending_commits(head)
+        if pending == 0:
+            with self._lock:
+                self.unpushed -= committed
+            return True
+        label = f"{pending} commits" if pending is not None else f"the commits up to {head[:12]}"
+        try:
+            infos = self.repo.remote(name=self.remote).push(refspec=f"{head}:refs/heads/{self.branch}")
+            infos.raise_if_error()
+            errors = [info.summary.strip() for info in infos if info.flags & PUSH_FAILURE_FLAGS]
+            if errors:
+                raise git.GitCommandError("push", 1, stderr="; ".join(errors))
+        except Exception as e:
+            with self._lock:
+                self.push_failures += 1
+            print(f"Pushing {label} to {self.remote}/{self.branch} failed: {e}")
+            return False
+        with self._lock:
+            self.unpushed -= committed
+            self.pushes += 1
+        print(f"Pushed {label} to {self.remote}/{self.branch}")
+        return True
+
+    def _run(self):
+        failures = 0
+        while not self._stopping:
+            if failures:
+                timeout = min(self.retry_delay * 2 ** (failures - 1), self.max_retry_delay)
+            else:
+                timeout = self.push_interval
+            self._wake.wait(timeout)
+            self._wake.clear()
+            if self._stopping:
+                break
+            failures = 0 if self.push() else failures + 1
+
+    def close(self, attempts=3):
+        """
+        Stop the background thread and push the remaining commits, retrying a few times.
+        :return: True if every commit was pushed.
+        """
+        if self._thread is not None:
+            self._stopping = True
+            self._wake.set()
+            self._thread.join()
+        pushed = not self.push_enabled
+        for attempt in range(attempts if self.push_enabled else 0):
+            # Always tried, the remote may still miss commits of an interrupted run
+            if self.push():
+                pushed = True
+                break
+            if attempt < attempts - 1:
+                time.sleep(min(self.retry_delay * 2 ** attempt, self.max_retry_delay))
+        if not pushed:
+            left = self.pending_commits()
+            print(f"{f'{left} commits are' if left is not None else 'Commits may be'} left unpushed in {self.repo_path}, push them with "
+                  f"git -C {self.repo_path} push {self.remote} HEAD:{self.branch}")
+        self.repo.close()
+        return pushed
+
+    def as_string(self):
+        return (f"Commits: {self.commits} committed, {self.pushes} pushes, {self.push_failures} failed pushes, "
+                f"{self.unpushed} unpushed")
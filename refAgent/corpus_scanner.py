@@ -0,0 +1,153 @@
+import argparse
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from utilities import refactoring_types_from_data, code_elements_from_data, code_element_types_from_data
+from refAgent.data_preprocessing import refactorings_from_data, no_refactoring_record
+from refAgent.sqlite_cache import SQLiteCache
+
+# Bump when the projections extracted from a file change so stale entries are ignored
+SCAN_VERSION = 1
+
+def scan_file(file_path):
+    """
+    Read one RefactoringMiner JSON file and extract every projection used by the analyses.
+    Invalid files give the same results as the per-projection functions of utilities and
+    data_preprocessing: no types, no code elements, no codeElementType entry and an
+    "Invalid JSON" record.
+    :return: Dictionary of JSON-serializable projections.
+    """
+    try:
+        with open(file_path, 'r') as f:
+            data = json.load(f)
+    except (json.JSONDecodeError, UnicodeDecodeError, OSError) as e:
+        print(f"Error decoding JSON: {e}")
+        return {"types": [], "code_elements": [], "code_element_types": None,
+                "refactorings": [no_refactoring_record(file_path, 'No Refactoring (Invalid JSON)')]}
+
+    try:
+        code_element_types = list(code_element_types_from_data(data).items())
+    except Exception:
+        # extract_code_element_types_from_files skips the files it cannot process
+        code_element_types = None
+    return {
+        "types": refactoring_types_from_data(data),
+        "code_elements": code_elements_from_data(data),
+        "code_element_types": code_element_types,
+        "refactorings": refactorings_from_data(data, file_path),
+    }
+
+
+class CorpusScan:
+    def __init__(self, file_results):
+        """
+        Projections of a RefactoringMiner corpus, keyed by file name like the utilities functions.
+        :param file_results: List of (file name, scan_file result) in walk order.
+        """
+        self.types_per_file = {}
+        self.code_elements_per_file = {}
+        self.code_element_types_per_file = {}
+        self.refactorings = []
+        for file_name, result in file_results:
+            self.types_per_file[file_name] = result["types"]
+            self.code_elements_per_file[file_name] = result["code_elements"]
+            if result["code_element_types"] is not None:
+                self.code_element_types_per_file[file_name] = dict(
+                    (refactoring_type, code_element_types) for refactoring_type, code_element_types in result["code_element_types"])
+            self.refactorings.extend(result["refactorings"])
+        self.files = len(file_results)
+
+
+class CorpusScanner:
+    def __init__(self, cache_path="data/cache/corpus_cache.sqlite", workers=None, max_entries=500000):
+        """
+        Read every JSON file of a RefactoringMiner corpus once and extract all the projections
+        (types per file, code elements to types, codeElementType per refactoring and location
+        records) in one pass. Results are cached per file and per folder, keyed by path and
+        stamped with the modification time and size of the files, so unchanged corpora load
+        from the cache and a changed one replaces its entries instead of adding new ones.
+        :param cache_path: Path to the SQLite cache (None to disable caching).
+        :param workers: Number of processes parsing the files missing from the cache.
+        :param max_entries: Maximum number of cached files and folders.
+        """
+        self.cache = SQLiteCache(cache_path, max_entries=max_entries) if cache_path else None
+        self.workers = workers
+
+    @staticmethod
+    def _file_key(file_path):
+        return f"file:v{SCAN_VERSION}:{os.path.abspath(file_path)}"
+
+    @staticmethod
+    def _stamp(stat):
+        return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+    def _cached(self, key, stamp):
+        # Entries written for another version of the file (or folder) are stale
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is None or cached["stamp"] != stamp:
+            return None
+        return cached["value"]
+
+    def scan(self, folder_path):
+        """
+        Scan the JSON files of a folder and its sub-folders.
+        :return: CorpusScan of the folder.
+        """
+        entries = []
+        for root, _, files in os.walk(folder_path):
+            for file in files:
+                if file.endswith('.json'):
+                    file_path = os.path.join(root, file)
+                    entries.append((file, file_path, os.stat(file_path)))
+
+        listing = "\n".join(f"{os.path.abspath(file_path)}:{self._stamp(stat)}" for _, file_path, stat in entries)
+        folder_key = f"folder:v{SCAN_VERSION}:{os.path.abspath(folder_path)}"
+        folder_stamp = hashlib.sha256(listing.encode('utf-8')).hexdigest()
+        cached = self._cached(folder_key, folder_stamp)
+        if cached is not None:
+            return CorpusScan(cached)
+
+        results = {}
+        missing = []
+        for _, file_path, stat in entries:
+            cached = self._cached(self._file_key(file_path), self._stamp(stat))
+            if cached is None:
+                missing.append((file_path, stat))
+            else:
+                results[file_path] = cached
+
+        if missing:
+            print(f"Scanning {len(missing)} of {len(entries)} files in {folder_path}")
+            paths = [file_path for file_path, _ in missing]
+            if self.workers == 1 or len(missing) == 1:
+                scanned = [scan_file(file_path) for file_path in paths]
+            else:
+                with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                    scanned = list(executor.map(scan_file, paths, chunksize=64))
+            for (file_path, stat), result in zip(missing, scanned):
+                results[file_path] = result
+                if self.cache is not None:
+                    self.cache.set(self._file_key(file_path), {"stamp": self._stamp(stat), "value": result})
+
+        file_results = [(file, results[file_path]) for file, file_path, _ in entries]
+        if self.cache is not None:
+            self.cache.set(folder_key, {"stamp": folder_stamp, "value": file_results})
+        return CorpusScan(file_results)
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scan RefactoringMiner outputs once and cache every projection")
+    parser.add_argument("folders", nargs="+", help="Folders of RefactoringMiner JSON files")
+    parser.add_argument("--workers", type=int, default=None, help="Number of parsing processes")
+    args = parser.parse_args()
+
+    scanner = CorpusScanner(workers=args.workers)
+    for folder in args.folders:
+        scan = scanner.scan(folder)
+        print(f"{folder}: {scan.files} files, {len(scan.refactorings)} refactoring locations")
+    scanner.close()
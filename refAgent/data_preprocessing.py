@@ -1,81 +1,197 @@
+import argparse
 import json
 import os
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    # Incremental parser, so a large RefactoringMiner output is never held as a whole document
+    import ijson
+except ImportError:
+    ijson = None
+
+REFACTORING_COLUMNS = ['file', 'type', 'codeElement', 'startLine', 'endLine']
+
+def no_refactoring_record(file_path, refactoring_type):
+    return {
+        'file': file_path,  # This would still be the external file path in case of no refactoring
+        'type': refactoring_type,
+        'codeElement': None,
+        'startLine': None,
+        'endLine': None
+    }
+
+def _iter_commits(f):
+    if ijson is not None:
+        return ijson.items(f, 'commits.item', use_float=True)
+    return json.load(f).get('commits', [])
+
+def location_rows(refactoring):
+    """
+    One record (file, type, codeElement, startLine, endLine) per location of a RefactoringMiner refactoring.
+    """
+    rows = []
+    refactoring_type = refactoring.get('type', 'Unknown')
+
+    # Extract left and right side locations
+    for side in ['leftSideLocations', 'rightSideLocations']:
+        for location in refactoring.get(side, []):
+            rows.append({
+                'file': location.get('filePath', 'Unknown'),
+                'type': refactoring_type,
+                'codeElement': location.get('codeElement', 'Unknown'),
+                'startLine': location.get('startLine', 'Unknown'),
+                'endLine': location.get('endLine', 'Unknown')
+            })
+    return rows
+
+def refactorings_from_data(data, file_path):
+    """
+    Location records of loaded RefactoringMiner JSON, or a "No Refactoring" record for file_path.
+    """
+    refactorings_info = []
+    has_refactoring = False
+    for commit in data.get('commits', []):
+        for refactoring in commit.get('refactorings', []):
+            has_refactoring = True
+            refactorings_info.extend(location_rows(refactoring))
+    if not has_refactoring:
+        refactorings_info.append(no_refactoring_record(file_path, 'No Refactoring'))
+    return refactorings_info
 
 def extract_refactorings_from_json(file_path):
     refactorings_info = []
-    
+    decode_errors = (json.decoder.JSONDecodeError, ijson.JSONError) if ijson is not None else json.decoder.JSONDecodeError
+
     try:
-        with open(file_path, 'r') as f:
-            data = json.load(f)
-        
-        has_refactoring = False
-        
-        for commit in data.get('commits', []):
-            for refactoring in commit.get('refactorings', []):
-                has_refactoring = True
-                refactoring_type = refactoring.get('type', 'Unknown')
-                
-                # Extract left and right side locations
-                for side in ['leftSideLocations', 'rightSideLocations']:
-                    for location in refactoring.get(side, []):
-                        file_path_from_json = location.get('filePath', 'Unknown')
-                        code_element = location.get('codeElement', 'Unknown')
-                        start_line = location.get('startLine', 'Unknown')
-                        end_line = location.get('endLine', 'Unknown')
-                        
-                        refactorings_info.append({
-                            'file': file_path_from_json,
-                            'type': refactoring_type,
-                            'codeElement': code_element,
-                            'startLine': start_line,
-                            'endLine': end_line
-                        })
-        
+        with open(file_path, 'rb') as f:
+            has_refactoring = False
+
+            for commit in _iter_commits(f):
+                for refactoring in commit.get('refactorings', []):
+                    has_refactoring = True
+                    refactorings_info.extend(location_rows(refactoring))
+
         # If no refactorings found, add an entry indicating "no refactoring"
         if not has_refactoring:
-            refactorings_info.append({
-                'file': file_path,  # This would still be the external file path in case of no refactoring
-                'type': 'No Refactoring',
-                'codeElement': None,
-                'startLine': None,
-                'endLine': None
-            })
-    
-    except json.decoder.JSONDecodeError:
+            refactorings_info.append(no_refactoring_record(file_path, 'No Refactoring'))
+
+    except decode_errors:
         # If JSON decoding fails, it is treated as "no refactoring"
-        refactorings_info.append({
-            'file': file_path,
-            'type': 'No Refactoring (Invalid JSON)',
-            'codeElement': None,
-            'startLine': None,
-            'endLine': None
-        })
-    
+        refactorings_info = [no_refactoring_record(file_path, 'No Refactoring (Invalid JSON)')]
+
     return refactorings_info
 
-def process_json_files_in_directory(directory_path):
-    all_refactorings = []
-    
-    for file_name in os.listdir(directory_path):
-        if file_name.endswith('.json'):
-            file_path = os.path.join(directory_path, file_name)
-            refactorings_info = extract_refactorings_from_json(file_path)
-            all_refactorings.extend(refactorings_info)
-    
-    return all_refactorings
+def iter_refactorings_in_directory(directory_path, workers=None, chunksize=64):
+    """
+    Yield the refactorings of every RefactoringMiner JSON file of a directory, file by file in
+    the order of os.listdir, parsing the files in a process pool.
+    :param workers: Number of parsing processes (the number of CPUs by default, 1 parses in this process).
+    :param chunksize: Number of files sent to a worker at once.
+    """
+    file_paths = [os.path.join(directory_path, file_name) for file_name in os.listdir(directory_path)
+                  if file_name.endswith('.json')]
+    if workers == 1 or len(file_paths) <= 1:
+        for file_path in file_paths:
+            yield from extract_refactorings_from_json(file_path)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for refactorings_info in executor.map(extract_refactorings_from_json, file_paths, chunksize=chunksize):
+            yield from refactorings_info
+
+def process_json_files_in_directory(directory_path, workers=None):
+    return list(iter_refactorings_in_directory(directory_path, workers=workers))
 
 def export_to_json(refactorings_data, output_file):
+    """
+    Write the refactorings as an indented JSON list, one record at a time, so any iterable
+    can be exported without building the list. The output is the same as json.dump(..., indent=4).
+    """
     with open(output_file, 'w') as jsonfile:
-        json.dump(refactorings_data, jsonfile, indent=4)
+        empty = True
+        for refactoring in refactorings_data:
+            jsonfile.write("[\n    " if empty else ",\n    ")
+            jsonfile.write(json.dumps(refactoring, indent=4).replace("\n", "\n    "))
+            empty = False
+        jsonfile.write("[]" if empty else "\n]")
+
+def _line_number(value):
+    # Line numbers missing from RefactoringMiner ('Unknown') are stored as nulls
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+def _text(value):
+    return None if value is None else str(value)
+
+def export_to_parquet(refactorings_data, output_file, batch_size=50000):
+    """
+    Write the refactorings to a Parquet file with typed columns (strings for file, type and
+    codeElement, nullable int32 line numbers), one row group per batch. Requires pyarrow.
+    :param refactorings_data: Iterable of refactoring records.
+    :param batch_size: Number of records buffered before a row group is written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('file', pa.string()),
+        ('type', pa.string()),
+        ('codeElement', pa.string()),
+        ('startLine', pa.int32()),
+        ('endLine', pa.int32()),
+    ])
+
+    def write_batch(writer, batch):
+        columns = {
+            'file': [_text(refactoring['file']) for refactoring in batch],
+            'type': [_text(refactoring['type']) for refactoring in batch],
+            'codeElement': [_text(refactoring['codeElement']) for refactoring in batch],
+            'startLine': [_line_number(refactoring['startLine']) for refactoring in batch],
+            'endLine': [_line_number(refactoring['endLine']) for refactoring in batch],
+        }
+        writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+
+    with pq.ParquetWriter(output_file, schema) as writer:
+        batch = []
+        for refactoring in refactorings_data:
+            batch.append(refactoring)
+            if len(batch) >= batch_size:
+                write_batch(writer, batch)
+                batch = []
+        if batch:
+            write_batch(writer, batch)
+
+def load_refactorings(file_path):
+    """
+    Load the refactorings exported by export_to_json or export_to_parquet, depending on the extension.
+    :return: List of refactoring records.
+    """
+    if file_path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        return pq.read_table(file_path, columns=REFACTORING_COLUMNS).to_pylist()
+    with open(file_path, 'r') as f:
+        return json.load(f)
+
 
-# Example usage
-project_name= "gson"
-directory_path = f'data/refactoring_types/developers/{project_name}'
-output_file = f'refactoring_results/developers/{project_name}_refactorings_output.json'
-refactorings_data = process_json_files_in_directory(directory_path)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Collect the refactorings mined by RefactoringMiner into one file")
+    parser.add_argument("project_name", type=str, help="Name of the project, e.g. gson")
+    parser.add_argument("--format", choices=["json", "parquet"], default="json",
+                        help="Output format, json is the one read by results/results-.py")
+    parser.add_argument("--workers", type=int, default=None, help="Number of parsing processes")
+    parser.add_argument("--input", type=str, default=None,
+                        help="Folder of the RefactoringMiner outputs (data/refactoring_types/developers/<project> by default)")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Output file (refactoring_results/developers/<project>_refactorings_output.<format> by default)")
+    args = parser.parse_args()
 
+    directory_path = args.input or f'data/refactoring_types/developers/{args.project_name}'
+    output_file = args.output or f'refactoring_results/developers/{args.project_name}_refactorings_output.{args.format}'
+    refactorings_data = iter_refactorings_in_directory(directory_path, workers=args.workers)
 
-# Export the data to JSON
-export_to_json(refactorings_data, output_file)
+    # Export the data, streamed from the parsing workers to the output file
+    if args.format == "parquet":
+        export_to_parquet(refactorings_data, output_file)
+    else:
+        export_to_json(refactorings_data, output_file)
 
-print(f"Data has been exported to {output_file}")
\ No newline at end of file
+    print(f"Data has been exported to {output_file}")
@@ -3,81 +3,119 @@ import networkx as nx
 import matplotlib.pyplot as plt
 import os
 import json
-from utilities import create_directory_if_not_exists
+from collections import defaultdict, deque
+from utilities import create_directory_if_not_exists, discover_java_files
+
+def extract_dependency_facts(code):
+    """
+    Parse Java source code once and extract the facts needed to build dependency graphs.
+    :param code: Java source code.
+    :return: Dictionary with the imported simple names, for every class declaration
+             (in traversal order) its name, supertypes, method names and call qualifiers,
+             the names of all the types declared in the file (and which ones are abstract),
+             and the simple names of the types the file references.
+    """
+    tree = javalang.parse.parse(code)
+
+    imports = [node.path.split(".")[-1] for path, node in tree.filter(javalang.tree.Import)]
+
+    types = []
+    abstract_types = []
+    for path, node in tree.filter(javalang.tree.TypeDeclaration):
+        types.append(node.name)
+        if 'abstract' in node.modifiers or isinstance(node, javalang.tree.InterfaceDeclaration):
+            abstract_types.append(node.name)
+
+    # Type uses, creators, casts and the qualifiers of calls and field accesses (e.g. static members)
+    references = set(name for name in imports if name != "*")
+    for path, node in tree.filter(javalang.tree.ReferenceType):
+        references.add(node.name.split(".")[0])
+        references.add(node.name.split(".")[-1])
+    for node_type in (javalang.tree.MethodInvocation, javalang.tree.MemberReference):
+        for path, node in tree.filter(node_type):
+            if node.qualifier:
+                references.add(node.qualifier.split(".")[0])
+    references.difference_update(types)
+
+    classes = []
+    for path, node in tree:
+        if isinstance(node, javalang.tree.ClassDeclaration):
+            supertypes = []
+            if node.extends:
+                supertypes.append(node.extends.name)
+            for iface in node.implements or []:
+                supertypes.append(iface.name)
+
+            methods = []
+            calls = []
+            for method in node.methods:
+                methods.append(method.name)
+                if method.body is not None:
+                    for _, expr in method.filter(javalang.tree.MethodInvocation):
+                        calls.append(expr.qualifier or "")
+
+            classes.append({
+                'name': node.name,
+                'supertypes': supertypes,
+                'methods': methods,
+                'calls': calls
+            })
+
+    return {'imports': imports, 'classes': classes, 'types': types, 'abstract_types': abstract_types,
+            'references': sorted(references)}
 
 class JavaClassDependencyAnalyzer:
-    def __init__(self, target_class):
+    def __init__(self, target_class, parse_cache=None):
         self.target_class = target_class
+        self.parse_cache = parse_cache
         self.classes = {}
         self.dependencies = nx.DiGraph()
 
     def analyze(self, code):
         try:
-            tree = javalang.parse.parse(code)
-            imports = set()
-            class_name = None
-
-            # First, collect imports
-            for path, node in tree.filter(javalang.tree.Import):
-                if isinstance(node, javalang.tree.Import):
-                    # Collect imports
-                    imports.add(node.path.split(".")[-1])
-
-            # Check if the target class is imported
-            if self.target_class in imports:
-                # Traverse the tree again to find the class declaration and add dependency
-                for path, node in tree:
-                    if isinstance(node, javalang.tree.ClassDeclaration):
-                        class_name = node.name
-                        self.dependencies.add_edge(self.target_class, class_name)
-                        self.classes[class_name] = {
-                            'name': class_name,
-                            'methods': [],
-                            'dependencies': set()
-                        }
-                        break  # We only need to add this class if it imports the target class
-
-            for path, node in tree:
-                if isinstance(node, javalang.tree.ClassDeclaration):
-                    class_name = node.name
-                    self.classes[class_name] = {
-                        'name': class_name,
-                        'methods': [],
-                        'dependencies': set()
-                    }
-
-                    # Inheritance (extends)
-                    if node.extends:
-                        base_class = node.extends.name
-                        if base_class == self.target_class:
-                            self.dependencies.add_edge(self.target_class, class_name)
-                        self.classes[class_name]['dependencies'].add(base_class)
-                        self.dependencies.add_edge(class_name, base_class)
-
-                    # Interfaces (implements)
-                    if node.implements:
-                        for iface in node.implements:
-                            iface_name = iface.name
-                            if iface_name == self.target_class:
-                                self.dependencies.add_edge(self.target_class, class_name)
-                            self.classes[class_name]['dependencies'].add(iface_name)
-                            self.dependencies.add_edge(class_name, iface_name)
-
-                    # Method calls within the class
-                    for method in node.methods:
-                        
-                        self.classes[class_name]['methods'].append(method.name)
-                        if method.body is not None: 
-                            for expr in method.body:
-                                if isinstance(expr, javalang.tree.MethodInvocation):
-                                    called_class = expr.qualifier or ""
-                                    self.classes[class_name]['dependencies'].add(called_class)
-                                    if called_class == self.target_class:
-                                        self.dependencies.add_edge(class_name, called_class)
-                    
-
+            if self.parse_cache is not None:
+                facts = self.parse_cache.facts_for_code(code)
+            else:
+                facts = extract_dependency_facts(code)
         except javalang.parser.JavaSyntaxError as e:
             print(f"Syntax error in file: {e}")
+            return
+        self.add_facts(facts)
+
+    def add_facts(self, facts):
+        classes = facts["classes"]
+
+        # Check if the target class is imported
+        if self.target_class in facts["imports"] and classes:
+            # Only the first class declaration of the importing file depends on the target
+            class_name = classes[0]["name"]
+            self.dependencies.add_edge(self.target_class, class_name)
+            self.classes[class_name] = {
+                'name': class_name,
+                'methods': [],
+                'dependencies': set()
+            }
+
+        for declaration in classes:
+            class_name = declaration["name"]
+            self.classes[class_name] = {
+                'name': class_name,
+                'methods': list(declaration["methods"]),
+                'dependencies': set()
+            }
+
+            # Inheritance (extends) and interfaces (implements)
+            for base_class in declaration["supertypes"]:
+                if base_class == self.target_class:
+                    self.dependencies.add_edge(self.target_class, class_name)
+                self.classes[class_name]['dependencies'].add(base_class)
+                self.dependencies.add_edge(class_name, base_class)
+
+            # Method calls within the class
+            for called_class in declaration["calls"]:
+                self.classes[class_name]['dependencies'].add(called_class)
+                if called_class == self.target_class:
+                    self.dependencies.add_edge(class_name, called_class)
 
     def analyze_project(self, directory):
         # Recursively find all Java files in the project directory
@@ -125,10 +163,126 @@ class JavaClassDependencyAnalyzer:
             json.dump(graph_data, f, ensure_ascii=False, indent=4)
 
 
+class JavaProjectDependencyIndex:
+    """
+    Project-wide dependency index. Every Java file of the project is parsed once and its
+    imports, supertypes and call qualifiers are folded into reverse-dependency maps, so the
+    dependency subgraph of any class can be answered without re-parsing the project.
+    The subgraphs are the same as the ones built by JavaClassDependencyAnalyzer.
+    """
+    def __init__(self, parse_cache=None):
+        self.parse_cache = parse_cache
+        self.files = {}
+        self.supertypes = defaultdict(set)
+        self.dependents = defaultdict(set)
+        self.callers = defaultdict(set)
+        self.type_files = {}
+        self.abstract_types = set()
+        self.references = defaultdict(set)
+
+    def add_file(self, file_path, facts):
+        """
+        Fold the facts of one parsed file into the index.
+        :param file_path: Path of the Java file.
+        :param facts: Facts returned by extract_dependency_facts.
+        """
+        self.files[file_path] = facts
+        classes = facts["classes"]
+
+        # An importing file only contributes its first class declaration
+        if classes:
+            for imported in facts["imports"]:
+                self.dependents[imported].add(classes[0]["name"])
+
+        for declaration in classes:
+            class_name = declaration["name"]
+            for base_class in declaration["supertypes"]:
+                self.supertypes[class_name].add(base_class)
+                self.dependents[base_class].add(class_name)
+            for called_class in declaration["calls"]:
+                self.callers[called_class].add(class_name)
+
+        # Every type of a file is considered to use everything the file references
+        for type_name in facts["types"]:
+            self.type_files[type_name] = file_path
+            self.references[type_name].update(facts["references"])
+        self.abstract_types.update(facts["abstract_types"])
+
+    def analyze_project(self, directory):
+        # Recursively find all Java files in the project directory and parse each one once
+        for file_path, is_test in discover_java_files(directory):
+            self.add_java_file(file_path)
+
+    def add_java_file(self, file_path):
+        """
+        Parse a Java file (or reuse its cached facts) and add it to the index.
+        Lets a caller walking the project for other reasons build the index in the same walk.
+        """
+        try:
+            # Files in another encoding (e.g. Latin-1) are read with replacement characters instead of stopping the walk
+            with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+                code = f.read()
+        except OSError as e:
+            print(f"Cannot read file {file_path}: {e}")
+            return
+        try:
+            if self.parse_cache is not None:
+                facts = self.parse_cache.facts_for_code(code)
+            else:
+                facts = extract_dependency_facts(code)
+        except (javalang.parser.JavaSyntaxError, javalang.tokenizer.LexerError) as e:
+            print(f"Syntax error in file {file_path}: {e}")
+            return
+        self.add_file(file_path, facts)
+
+    def contains(self, target_class):
+        return bool(self.dependents.get(target_class) or self.supertypes.get(target_class)
+                    or self.callers.get(target_class))
+
+    def dependency_subgraph(self, target_class):
+        """
+        Build the dependency subgraph of a class: the target, the classes depending on it
+        and, transitively, their supertypes.
+        :param target_class: Simple name of the target class.
+        :return: networkx.DiGraph, or None if the class has no dependencies in the project.
+        """
+        if not self.contains(target_class):
+            return None
+
+        subgraph_nodes = [target_class]
+        seen = {target_class}
+        queue = deque([target_class])
+        while queue:
+            node = queue.popleft()
+            successors = self.supertypes.get(node, set())
+            if node == target_class:
+                successors = successors | self.dependents.get(target_class, set())
+            for successor in sorted(successors):
+                if successor not in seen:
+                    seen.add(successor)
+                    subgraph_nodes.append(successor)
+                    queue.append(successor)
+
+        graph = nx.DiGraph()
+        graph.add_nodes_from(subgraph_nodes)
+        for node in subgraph_nodes:
+            for base_class in self.supertypes.get(node, ()):
+                graph.add_edge(node, base_class)
+        for dependent in self.dependents.get(target_class, ()):
+            graph.add_edge(target_class, dependent)
+        for caller in self.callers.get(target_class, ()):
+            if caller in seen:
+                graph.add_edge(caller, target_class)
+        return graph
+
+
 def draw_dependency_graph(graph, filename='java_class_dependency_graph.png'):
     pos = nx.spring_layout(graph)
-    plt.figure(figsize=(12, 8))
-    nx.draw(graph, pos, with_labels=True, node_size=3000, node_color="skyblue", font_size=12, font_weight="bold", arrows=True)
-    plt.title("Java Class Dependency Graph")
-    plt.savefig(filename)
-
+    figure = plt.figure(figsize=(12, 8))
+    try:
+        nx.draw(graph, pos, with_labels=True, node_size=3000, node_color="skyblue", font_size=12, font_weight="bold", arrows=True)
+        plt.title("Java Class Dependency Graph")
+        plt.savefig(filename)
+    finally:
+        # Free the figure, pyplot keeps every open figure alive otherwise
+        plt.close(figure)
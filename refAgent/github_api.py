@@ -1,22 +1,46 @@
 import requests
 import random
 import json
-import subprocess
-import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from utilities import *
 from tqdm import tqdm  # Import tqdm for the progress bar
 from settings import Settings
+from refAgent.refactoring_miner import RefactoringMinerRunner
+from refAgent.sqlite_cache import SQLiteCache
 
 config = Settings()
 class GitHubAPI:
-    def __init__(self, tokens):
+    def __init__(self, tokens, max_workers=8, cache=None, api_url="https://api.github.com"):
         """
         Initialize the GitHubAPI class with a list of tokens.
         
-        :param tokens: List of GitHub API tokens
+        :param tokens: List of GitHub API tokens (or a comma-separated string of tokens)
+        :param max_workers: Number of requests sent in parallel, and size of the connection pool
+        :param cache: Optional SQLiteCache of the responses, revalidated with conditional requests (ETag)
+        :param api_url: Base URL of the GitHub REST API
         """
-        self.tokens = tokens
+        if isinstance(tokens, str):
+            tokens = [token.strip() for token in tokens.split(",") if token.strip()]
+        if not tokens:
+            raise ValueError("No GitHub API token configured, set GITHUB_API_KEY to one token or a comma-separated list")
+        self.tokens = list(tokens)
         self.token = None
+        self.max_workers = max_workers
+        self.cache = cache
+        self.api_url = api_url.rstrip("/")
+
+        # One pooled session for all the requests, so connections are reused
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        # Remaining requests and reset time (epoch seconds) of every token, from the rate-limit headers
+        self._quota_lock = threading.Lock()
+        self.quotas = {token: {"remaining": None, "reset": 0} for token in tokens}
 
     def set_random_token(self):
         """
@@ -24,6 +48,68 @@ class GitHubAPI:
         """
         self.token = random.choice(self.tokens)
 
+    def pick_token(self):
+        """
+        Pick the token with the most remaining requests. Tokens never used yet are tried first,
+        and when every token is exhausted, wait until the earliest reset.
+        """
+        while True:
+            with self._quota_lock:
+                now = time.time()
+                for quota in self.quotas.values():
+                    if quota["remaining"] is not None and quota["reset"] <= now:
+                        quota["remaining"] = None
+                available = [token for token, quota in self.quotas.items() if quota["remaining"] != 0]
+                if available:
+                    token = max(available, key=lambda t: float("inf") if self.quotas[t]["remaining"] is None
+                                else self.quotas[t]["remaining"])
+                    if self.quotas[token]["remaining"] is not None:
+                        # Reserve the request so parallel callers spread over the tokens
+                        self.quotas[token]["remaining"] -= 1
+                    return token
+                wait = min(quota["reset"] for quota in self.quotas.values()) - now
+            print(f"All GitHub tokens are rate limited, waiting {wait:.0f} seconds")
+            time.sleep(max(wait, 1))
+
+    def _update_quota(self, token, response):
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        if remaining is None:
+            return
+        with self._quota_lock:
+            self.quotas[token] = {"remaining": int(remaining), "reset": float(reset) if reset else time.time() + 3600}
+
+    def get_json(self, url):
+        """
+        GET an API URL with the least used token. Cached responses are revalidated with their ETag,
+        and a 304 answer (which does not count against the rate limit) reuses the cached body.
+        Requests refused by the rate limit are retried with another token.
+        :return: The decoded JSON body.
+        """
+        cached = self.cache.get(url) if self.cache is not None else None
+        while True:
+            token = self.pick_token()
+            headers = {
+                'Authorization': f'token {token}',
+                'Accept': 'application/vnd.github.v3+json',
+            }
+            if cached is not None:
+                headers['If-None-Match'] = cached["etag"]
+
+            response = self.session.get(url, headers=headers)
+            self._update_quota(token, response)
+
+            if response.status_code == 304 and cached is not None:
+                return cached["body"]
+            if response.status_code == 200:
+                body = response.json()
+                if self.cache is not None and response.headers.get("ETag"):
+                    self.cache.set(url, {"etag": response.headers["ETag"], "body": body})
+                return body
+            if response.status_code in (403, 429) and response.headers.get("X-RateLimit-Remaining") == "0":
+                continue
+            raise Exception(f"Failed to fetch commits: {response.status_code}, {response.text}")
+
     def get_commit_ids(self, repo_owner, repo_name, per_page=30, since=None, until=None, file_path=None):
         """
         Retrieve the list of commit IDs from a given repository, with optional date filtering.
@@ -39,16 +125,8 @@ class GitHubAPI:
         page = 1  # Start with the first page
 
         while True:
-            # Set a new random token for each page request
-            self.set_random_token()
-
-            headers = {
-                'Authorization': f'token {self.token}',
-                'Accept': 'application/vnd.github.v3+json',
-            }
-            
             # Construct the URL with page, since, and until parameters
-            url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/commits?page={page}&per_page={per_page}"
+            url = f"{self.api_url}/repos/{repo_owner}/{repo_name}/commits?page={page}&per_page={per_page}"
             if since:
                 url += f"&since={since}"
             if until:
@@ -56,21 +134,34 @@ class GitHubAPI:
             if file_path:
                 url += f"&path={file_path}"
             
-            response = requests.get(url, headers=headers)
-
-            if response.status_code == 200:
-                commits = response.json()
+            commits = self.get_json(url)
 
-                if not commits:
-                    # No more commits to retrieve, exit the loop
-                    break
+            if not commits:
+                # No more commits to retrieve, exit the loop
+                break
 
-                commit_ids.extend([commit['sha'] for commit in commits])
-                page += 1  # Move to the next page
-            else:
-                raise Exception(f"Failed to fetch commits: {response.status_code}, {response.text}")
+            commit_ids.extend([commit['sha'] for commit in commits])
+            if len(commits) < per_page:
+                # A partial page is the last one
+                break
+            page += 1  # Move to the next page
         
         return commit_ids
+
+    def get_commit_ids_for_paths(self, repo_owner, repo_name, file_paths, per_page=100, since=None, until=None):
+        """
+        Retrieve the commits touching any of several files, fetching the files in parallel.
+
+        :param file_paths: Paths of the files relative to the repository root
+        :return: The commit IDs without duplicates, in the order of the files
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            results = executor.map(lambda path: self.get_commit_ids(repo_owner, repo_name, per_page=per_page, since=since,
+                                                                    until=until, file_path=path), file_paths)
+            commit_ids = {}
+            for ids in tqdm(results, total=len(file_paths), desc=f"Fetching the commits of {repo_name}"):
+                commit_ids.update(dict.fromkeys(ids))
+        return list(commit_ids)
     
     def export_commits_to_json(self, repo_name, commit_ids, filename):
         """
@@ -87,41 +178,28 @@ class GitHubAPI:
 
         print(f"Commit IDs exported to {filename}")
 
-    def run_refactoring_miner(self, repo_owner, repo_name, commit_ids, output_folder):
+    def run_refactoring_miner(self, repo_owner, repo_name, commit_ids, output_folder, workers=4, batch_size=50):
         """
-        Execute the RefactoringMiner command for each commit ID.
+        Execute RefactoringMiner on the commits of a repository, cloned once under data/clones.
+        Commits are analysed in batches spread over a process pool, and commits whose output
+        JSON already exists are skipped.
 
-        :param repo_url: The repository URL
+        :param repo_owner: GitHub username or organization name of the repository owner
+        :param repo_name: Name of the repository
         :param commit_ids: List of commit IDs to process
         :param output_folder: Folder to store the JSON output for each commit
+        :param workers: Number of RefactoringMiner processes
+        :param batch_size: Maximum number of commits analysed by one RefactoringMiner process
         """
-        # Ensure the output directory exists
-        os.makedirs(output_folder, exist_ok=True)
-        for commit_id in commit_ids:
-            output_file = f"{output_folder}/refactoring_{commit_id}.json"
-            repo_url = f"https://github.com/{repo_owner}/{repo_name}.git"
-            command = [
-                "./RefactoringMiner/RefactoringMiner-3.0.9/bin/RefactoringMiner",
-                "-gc",
-                repo_url,
-                commit_id,
-                "10",
-                "-json",
-                output_file
-            ]
-            
-            try:
-                print(f"Running RefactoringMiner for commit {commit_id}...")
-                subprocess.run(command, check=True)
-                print(f"RefactoringMiner completed for commit {commit_id}, output saved to {output_file}")
-            except subprocess.CalledProcessError as e:
-                print(f"Error running RefactoringMiner for commit {commit_id}: {e}")
+        repo_url = f"https://github.com/{repo_owner}/{repo_name}.git"
+        runner = RefactoringMinerRunner(repo_url, f"data/clones/{repo_owner}/{repo_name}", workers=workers, batch_size=batch_size)
+        return runner.run(commit_ids, output_folder)
 
 # Example usage:
 tokens = config.GITHUB_API_KEY
 
 # List of your GitHub API tokens
-github_api = GitHubAPI(tokens)
+github_api = GitHubAPI(tokens, cache=SQLiteCache("data/cache/github_cache.sqlite", max_entries=100000))
 
 
 ### Developers changes
@@ -133,14 +211,12 @@ github_api = GitHubAPI(tokens)
 # for repo_name in repo_names:   
 #     files = read_json_file(f"data/paths/{repo_name}/{repo_name}_files.json")
 #     files = find_non_test_files(files)
-#     commits = []
-#     for path in tqdm(files, desc=f"Processing files of repo {repo_name}"):
-#         path = path.replace(f"projects/{repo_name}/","")
-#         commit_ids = github_api.get_commit_ids(repo_owner, repo_name, per_page=50, since=2023, file_path=path)
-#         commits+=commit_ids
-
-#         output_folder = f"data/refactoring_types/developers/{repo_name}"  # Specify the folder where the JSON files will be saved
-#         github_api.run_refactoring_miner(repo_owner, repo_name, commit_ids, output_folder)
+#     paths = [path.replace(f"projects/{repo_name}/","") for path in files]
+#     commits = github_api.get_commit_ids_for_paths(repo_owner, repo_name, paths, per_page=100, since=2023)
+
+#     # Mine all the commits at once, duplicates and already mined commits are skipped
+#     output_folder = f"data/refactoring_types/developers/{repo_name}"  # Specify the folder where the JSON files will be saved
+#     github_api.run_refactoring_miner(repo_owner, repo_name, commits, output_folder)
 
 
     # Output the list of commit IDs
@@ -1,6 +1,8 @@
 import javalang
 import os
+import re
 import glob
+import hashlib
 import subprocess
 import pandas as pd
 from collections import defaultdict
@@ -28,6 +30,7 @@ class JavaMetricsCalculator:
     def run_designite(self):
         """
         Run the DesigniteJava tool to generate method and type metrics.
+        :return: True if DesigniteJava completed successfully.
         """
         command = [
             "java", "-jar", self.designite_jar,
@@ -38,8 +41,10 @@ class JavaMetricsCalculator:
             print("Executing DesigniteJava tool...")
             subprocess.run(command, check=True)
             print("DesigniteJava execution completed successfully.")
+            return True
         except subprocess.CalledProcessError as e:
             print(f"Error executing DesigniteJava: {e}")
+            return False
 
     def parse_metrics(self):
         """
@@ -118,8 +123,12 @@ class JavaMetricsCalculator:
         """
         Return the metrics as a formatted string for display.
         """
+        return self._format_metrics(self.metrics)
+
+    @staticmethod
+    def _format_metrics(metrics):
         result = []
-        for class_name, metric in self.metrics.items():
+        for class_name, metric in metrics.items():
             result.append(f"Class: {class_name}")
             result.append("Class Metrics:")
             for k, v in metric.get("class_metrics", {}).items():
@@ -158,6 +167,166 @@ class JavaMetricsCalculator:
                     print(f"Error removing {file_path}: {e}")
         print("Repository cleaning completed.")
 
+class ProjectMetricsCalculator(JavaMetricsCalculator):
+    def __init__(self, input_path, output_path, designite_jar):
+        """
+        Compute the metrics of a whole project with a single DesigniteJava launch and serve
+        the metrics of each class from that run, instead of launching DesigniteJava per class.
+        :param input_path: Root folder of the project.
+        :param output_path: Path to store DesigniteJava outputs.
+        :param designite_jar: Path to the DesigniteJava jar file.
+        """
+        super().__init__(input_path, output_path, designite_jar)
+        self.fingerprint_file = os.path.join(output_path, 'project_fingerprint.txt')
+        self.type_metrics = {}
+        self.types_by_file = {}
+        self.types_by_package = {}
+
+    def project_fingerprint(self):
+        """
+        Hash of the path, size and modification time of every Java file of the project.
+        """
+        digest = hashlib.sha256()
+        for root, dirs, files in os.walk(self.input_path):
+            dirs.sort()
+            for file in sorted(files):
+                if file.endswith(".java"):
+                    file_path = os.path.join(root, file)
+                    stat = os.stat(file_path)
+                    digest.update(f"{os.path.relpath(file_path, self.input_path)}:{stat.st_size}:{stat.st_mtime_ns}\n".encode('utf-8'))
+        return digest.hexdigest()
+
+    def _stored_fingerprint(self):
+        try:
+            with open(self.fingerprint_file, 'r') as f:
+                return f.read().strip()
+        except OSError:
+            return None
+
+    def compute_project_metrics(self, refresh=False):
+        """
+        Run DesigniteJava once over the project. The outputs of a previous run are reused unless
+        refresh is set or the project changed since they were written.
+        """
+        fingerprint = self.project_fingerprint()
+        outputs_exist = os.path.exists(self.method_metrics_file) and os.path.exists(self.type_metrics_file)
+        if refresh or not outputs_exist or self._stored_fingerprint() != fingerprint:
+            os.makedirs(self.output_path, exist_ok=True)
+            if self.run_designite():
+                # Only outputs of a completed run are stamped as up to date
+                with open(self.fingerprint_file, 'w') as f:
+                    f.write(fingerprint)
+        else:
+            print(f"Reusing DesigniteJava outputs in {self.output_path}")
+        self.parse_metrics()
+
+    @staticmethod
+    def _normalize_path(path):
+        return os.path.normcase(os.path.realpath(path))
+
+    @staticmethod
+    def _package(package):
+        # Classes of the default package have no package name in the DesigniteJava outputs
+        return package if isinstance(package, str) and package else None
+
+    def parse_metrics(self):
+        """
+        Parse the generated CSV files, keeping types with the same name in different packages apart,
+        and index the types by declaring file and by package for the per-class lookups.
+        """
+        if not (os.path.exists(self.method_metrics_file) and os.path.exists(self.type_metrics_file)):
+            print("Metrics files not found. Ensure DesigniteJava execution is successful.")
+            return
+
+        method_metrics = pd.read_csv(self.method_metrics_file)
+        type_metrics = pd.read_csv(self.type_metrics_file)
+        self.type_metrics = {}
+        files = {}
+
+        for row in method_metrics.to_dict('records'):
+            key = (self._package(row.get('Package Name')), row['Type Name'])
+            files.setdefault(key, row.get('File path'))
+            self.type_metrics.setdefault(key, {}).setdefault('methods', []).append({
+                "Method Name": row['MethodName'],
+                "Cyclomatic Complexity (CC)": row['CC'],
+                "Lines of Code (LOC)": row['LOC'],
+                "Parameter Count (PC)": row['PC']
+            })
+
+        for row in type_metrics.to_dict('records'):
+            key = (self._package(row.get('Package Name')), row['Type Name'])
+            files[key] = row.get('File path')
+            self.type_metrics.setdefault(key, {})['class_metrics'] = {
+                "Number of Fields (NOF)": row['NOF'],
+                "Number of Public Fields (NOPF)": row['NOPF'],
+                "Number of Methods (NOM)": row['NOM'],
+                "Number of Public Methods (NOPM)": row['NOPM'],
+                "Lines of Code (LOC)": row['LOC'],
+                "Weighted Methods per Class (WMC)": row['WMC'],
+                "Lack of Cohesion of Methods (LCOM)": row['LCOM']
+            }
+
+        # Recent DesigniteJava versions report the file declaring each type
+        self.types_by_file = {}
+        self.types_by_package = {}
+        for (package, type_name), data in self.type_metrics.items():
+            file_path = files.get((package, type_name))
+            if isinstance(file_path, str) and file_path:
+                self.types_by_file.setdefault(self._normalize_path(file_path), {})[type_name] = data
+            self.types_by_package.setdefault(package, {})[type_name] = data
+        print(f"Metrics parsing completed for {len(self.type_metrics)} types.")
+
+    @staticmethod
+    def _declared_types(java_code):
+        """
+        Names of every type declared in a compilation unit, nested and secondary types included, in declaration order.
+        """
+        try:
+            tree = javalang.parse.parse(java_code)
+            return list(dict.fromkeys(node.name for _, node in tree.filter(javalang.tree.TypeDeclaration)))
+        except (javalang.parser.JavaSyntaxError, javalang.tokenizer.LexerError):
+            return list(dict.fromkeys(re.findall(r'\b(?:class|interface|enum|@interface)\s+(\w+)', java_code)))
+
+    def _class_metrics(self, class_name, java_code=None, file_path=None):
+        """
+        Metrics of every type declared in the file of a class, like a DesigniteJava run on that file alone.
+        Types are matched by the file path reported by DesigniteJava when available, otherwise by
+        package and declared type names.
+        """
+        if file_path is not None and self.types_by_file:
+            return dict(self.types_by_file.get(self._normalize_path(file_path), {}))
+
+        package = None
+        type_names = [class_name]
+        if java_code is not None:
+            match = re.search(r'^\s*package\s+([\w.]+)\s*;', java_code, re.MULTILINE)
+            package = match.group(1) if match else None
+            type_names += self._declared_types(java_code)
+
+        package_types = self.types_by_package.get(package, {})
+        return {type_name: package_types[type_name] for type_name in dict.fromkeys(type_names) if type_name in package_types}
+
+    def metrics_for_class(self, class_name, java_code=None, file_path=None):
+        """
+        Return the metrics of the types declared in the file of a class, in the format of compute_metrics_for_class.
+        :param class_name: Name of the class.
+        :param java_code: Source code of the class, used to tell apart classes with the same name.
+        :param file_path: Path of the class file, matched against the file paths of the DesigniteJava outputs.
+        """
+        final_metrics = {}
+        for name, data in self._class_metrics(class_name, java_code, file_path).items():
+            final_metrics[name] = {
+                "Class Metrics": data.get('class_metrics', {}),
+                "Method Metrics": data.get('methods', [])
+            }
+        return final_metrics
+
+    def class_as_string(self, class_name, java_code=None, file_path=None):
+        """
+        Return the metrics of the types declared in the file of a class as a formatted string for display.
+        """
+        return self._format_metrics(self._class_metrics(class_name, java_code, file_path))
+
 # Example Usage
 if __name__ == "__main__":
     input_path = "code_smells/project"  # Path to the Java code directory
@@ -0,0 +1,34 @@
+import hashlib
+import json
+from refAgent.sqlite_cache import SQLiteCache
+
+class LLMResponseCache(SQLiteCache):
+    def __init__(self, db_path="data/cache/llm_cache.sqlite", max_entries=50000, max_bytes=None, ttl=30 * 24 * 3600):
+        """
+        Persistent cache of LLM replies keyed by (model, system prompt, user prompt,
+        temperature, max_tokens), so re-running a project does not pay again for identical prompts.
+        :param db_path: Path to the SQLite database file.
+        :param max_entries: Maximum number of cached replies (least recently used are evicted first).
+        :param max_bytes: Maximum total size of the cached replies in bytes.
+        :param ttl: Time to live of a reply in seconds (None for no expiry).
+        """
+        super().__init__(db_path, max_entries=max_entries, max_bytes=max_bytes, ttl=ttl)
+
+    @staticmethod
+    def make_key(model, prompt, query, temperature, max_tokens):
+        data = json.dumps([model, prompt, query, temperature, max_tokens])
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def lookup(self, model, prompt, query, temperature, max_tokens):
+        """
+        Return the cached reply for a request, or None.
+        """
+        return self.get(self.make_key(model, prompt, query, temperature, max_tokens))
+
+    def store(self, model, prompt, query, temperature, max_tokens, reply):
+        self.set(self.make_key(model, prompt, query, temperature, max_tokens), reply)
+
+    def as_string(self):
+        stats = self.stats()
+        return (f"LLM cache: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.1%} hit rate), {stats['entries']} entries, {stats['evictions']} evictions")
@@ -1,4 +1,8 @@
+import bisect
 import json
+import random
+import time
+from refAgent.data_preprocessing import load_refactorings
 
 # Example data for three projects
 projects = ['closure-templates', 'gson', 'JxPath']
@@ -10,7 +14,110 @@ def load_json_from_file(file_path):
     with open(file_path, 'r') as file:
         return json.load(file)
 
+class DeveloperChangeIndex:
+    """
+    Developer changes grouped by (file, refactoring type), each group holding its line intervals
+    sorted by start line with a max-end segment tree, so the changes whose range contains a line
+    are found in O(log n + matches) instead of scanning every developer change.
+    """
+    def __init__(self, dev_changes, valid_refactoring_types):
+        valid_refactoring_types = set(valid_refactoring_types)
+        groups = {}
+        for dev_index, dev_change in enumerate(dev_changes):
+            # Only valid types with a known range can ever match
+            if dev_change['type'] not in valid_refactoring_types:
+                continue
+            if not (dev_change['startLine'] and dev_change['endLine']):
+                continue
+            groups.setdefault((dev_change['file'], dev_change['type']), []).append(
+                (dev_change['startLine'], dev_index, dev_change['endLine']))
+
+        self.groups = {}
+        for key, intervals in groups.items():
+            if all(isinstance(start, (int, float)) and isinstance(end, (int, float)) for start, _, end in intervals):
+                intervals.sort()
+                self.groups[key] = self._build(intervals)
+            else:
+                # Lines that cannot be ordered are compared one by one, as in the nested loop
+                self.groups[key] = (None, intervals, None, None)
+
+    @staticmethod
+    def _build(intervals):
+        starts = [start for start, _, _ in intervals]
+        size = 1
+        while size < len(intervals):
+            size *= 2
+        max_end = [float("-inf")] * (2 * size)
+        for position, (_, _, end) in enumerate(intervals):
+            max_end[size + position] = end
+        for node in range(size - 1, 0, -1):
+            max_end[node] = max(max_end[2 * node], max_end[2 * node + 1])
+        return (starts, intervals, max_end, size)
+
+    def matches(self, file, refactoring_type, line):
+        """
+        Return the (dev_start, dev_index, dev_end) intervals of a group containing a line, in the
+        order of the developer changes.
+        """
+        group = self.groups.get((file, refactoring_type))
+        if group is None:
+            return []
+        starts, intervals, max_end, size = group
+        if starts is None:
+            return [interval for interval in intervals if interval[0] <= line <= interval[2]]
+
+        # Intervals starting at or before the line, among which those ending at or after it
+        limit = bisect.bisect_right(starts, line)
+        found = []
+        stack = [(1, 0, size)]
+        while stack:
+            node, low, high = stack.pop()
+            if low >= limit or max_end[node] < line:
+                continue
+            if high - low == 1:
+                found.append(intervals[low])
+                continue
+            middle = (low + high) // 2
+            stack.append((2 * node + 1, middle, high))
+            stack.append((2 * node, low, middle))
+        found.sort(key=lambda interval: interval[1])
+        return found
+
+
 def find_matching_changes(llm_changes, dev_changes, valid_refactoring_types):
+    """
+    Match every LLM change with the developer changes of the same file and refactoring type whose
+    line range contains its start line. Same results as find_matching_changes_nested.
+    """
+    total_overlap = 0
+    overlap_details = []
+    index = DeveloperChangeIndex(dev_changes, valid_refactoring_types)
+
+    for llm_change in llm_changes:
+        llm_file = llm_change['file']
+        llm_type = llm_change['type']
+        llm_start = llm_change['startLine']
+        llm_end = llm_change['endLine']
+        if not (llm_start and llm_end):
+            continue
+
+        for dev_start, dev_index, dev_end in index.matches(llm_file, llm_type, llm_start):
+            total_overlap += 1
+            overlap_details.append({
+                'file': llm_file,
+                'refactoring_type': llm_type,
+                'llm_startLine': llm_start,
+                'llm_endLine': llm_end,
+                'dev_startLine': dev_start,
+                'dev_endLine': dev_end
+            })
+
+    return total_overlap, overlap_details
+
+def find_matching_changes_nested(llm_changes, dev_changes, valid_refactoring_types):
+    """
+    Reference implementation of find_matching_changes comparing every pair of changes, kept for benchmarking.
+    """
     total_overlap = 0
     overlap_details = []
 
@@ -50,9 +157,9 @@ def find_matching_changes(llm_changes, dev_changes, valid_refactoring_types):
     return total_overlap, overlap_details
 
 def compute_precision_recall(llm_json, dev_json, valid_refactoring_types):
-    # Parse the JSON contents
-    llm_changes = load_json_from_file(llm_json)
-    dev_changes = load_json_from_file(dev_json)
+    # Parse the JSON (or Parquet) contents
+    llm_changes = load_refactorings(llm_json)
+    dev_changes = load_refactorings(dev_json)
 
     # Track unique files with refactorings for LLM and developers
     llm_refactoring_files = set()
@@ -83,3 +190,42 @@ def compute_precision_recall(llm_json, dev_json, valid_refactoring_types):
 
     return precision, recall, total_overlap, overlap_details
 
+
+
+def benchmark_matching(n_llm=5000, n_dev=20000, n_files=200, seed=0, valid_refactoring_types=None):
+    """
+    Time find_matching_changes against find_matching_changes_nested on synthetic changes and check
+    that both return the same results.
+    :return: Dictionary with both durations, the speedup and the number of overlaps.
+    """
+    rng = random.Random(seed)
+    types = ["Extract Method", "Rename Method", "Rename Variable", "Move Method", "Inline Method", "Extract Variable"]
+    if valid_refactoring_types is None:
+        valid_refactoring_types = types[:4]
+
+    def make_change():
+        start = rng.choice([None, rng.randint(1, 2000)]) if rng.random() < 0.02 else rng.randint(1, 2000)
+        return {'file': f"src/File{rng.randrange(n_files)}.java", 'type': rng.choice(types),
+                'startLine': start, 'endLine': (start or 1) + rng.randint(0, 60)}
+
+    llm_changes = [make_change() for _ in range(n_llm)]
+    dev_changes = [make_change() for _ in range(n_dev)]
+
+    begin = time.perf_counter()
+    nested = find_matching_changes_nested(llm_changes, dev_changes, valid_refactoring_types)
+    nested_time = time.perf_counter() - begin
+
+    begin = time.perf_counter()
+    indexed = find_matching_changes(llm_changes, dev_changes, valid_refactoring_types)
+    indexed_time = time.perf_counter() - begin
+
+    if nested != indexed:
+        raise AssertionError("The indexed matching differs from the nested loop")
+    return {"nested_seconds": nested_time, "indexed_seconds": indexed_time,
+            "speedup": nested_time / indexed_time if indexed_time > 0 else float("inf"), "total_overlap": indexed[0]}
+
+
+if __name__ == "__main__":
+    result = benchmark_matching()
+    print(f"Nested loop: {result['nested_seconds']:.2f}s, indexed: {result['indexed_seconds']:.3f}s "
+          f"({result['speedup']:.0f}x faster, {result['total_overlap']} overlaps)")
@@ -0,0 +1,49 @@
+import hashlib
+from refAgent.sqlite_cache import SQLiteCache
+from refAgent.dependency_graph import extract_dependency_facts
+
+# Bump when the shape of the extracted facts changes so stale entries are ignored
+FACTS_VERSION = 2
+
+class ParseCache(SQLiteCache):
+    def __init__(self, db_path="data/cache/parse_cache.sqlite", max_entries=200000, max_bytes=None):
+        """
+        On-disk cache of the facts extracted from parsed Java files (class names, imports,
+        supertypes, method names, call qualifiers and referenced types), keyed by the hash of the file content.
+        Unchanged files skip javalang parsing entirely on re-runs and resumed runs.
+        :param db_path: Path to the SQLite database file.
+        :param max_entries: Maximum number of cached files.
+        :param max_bytes: Maximum total size of the cached facts in bytes.
+        """
+        super().__init__(db_path, max_entries=max_entries, max_bytes=max_bytes)
+
+    def cached_for_code(self, namespace, code, compute):
+        """
+        Return compute(code), computing it only when nothing is cached for this namespace and content.
+        :param namespace: Kind and version of the cached value (e.g. "facts:v1").
+        :param code: Java source code.
+        :param compute: Function deriving a JSON-serializable value from the code.
+        """
+        key = f"{namespace}:{hashlib.sha256(code.encode('utf-8')).hexdigest()}"
+        value = self.get(key)
+        if value is None:
+            value = compute(code)
+            self.set(key, value)
+        return value
+
+    def facts_for_code(self, code):
+        """
+        Return the dependency facts of Java source code, parsing it only on a cache miss.
+        Raises the javalang parsing errors for code that cannot be parsed.
+        """
+        return self.cached_for_code(f"facts:v{FACTS_VERSION}", code, extract_dependency_facts)
+
+    def facts_for_file(self, file_path):
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as f:
+            code = f.read()
+        return self.facts_for_code(code)
+
+    def as_string(self):
+        stats = self.stats()
+        return (f"Parse cache: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.1%} hit rate), {stats['entries']} entries, {stats['evictions']} evictions")
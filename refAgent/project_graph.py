@@ -0,0 +1,212 @@
+import json
+import os
+import networkx as nx
+import numpy as np
+from collections import deque
+from utilities import is_test_file
+from refAgent.test_selection import is_test_class
+
+GRAPH_MAGIC = b"RAGRAPH1"
+
+# Node flags
+DECLARED = 1  # The type is declared in the project
+TEST = 2      # The type is declared in a test file
+
+class ProjectGraph:
+    """
+    Compact dependency graph of a whole project, stored in one binary file. Nodes are the
+    type names indexed by integers (in name order) and every relation of
+    JavaProjectDependencyIndex is kept as CSR arrays (indptr/indices), which are memory
+    mapped on load. The dependency subgraph of any class is sliced from it on demand and is
+    the same as the one answered by the index.
+    """
+    RELATIONS = ("supertypes", "dependents", "callers")
+
+    def __init__(self, nodes, arrays):
+        """
+        :param nodes: Type names, the index of a name being its node id.
+        :param arrays: Dictionary with the "flags" array and the "<relation>_indptr" and
+                       "<relation>_indices" arrays of every relation.
+        """
+        self.nodes = nodes
+        self.node_ids = {name: node_id for node_id, name in enumerate(nodes)}
+        self.arrays = arrays
+
+    @classmethod
+    def from_index(cls, index):
+        """
+        Build the graph of a project from its JavaProjectDependencyIndex.
+        """
+        relations = {relation: getattr(index, relation) for relation in cls.RELATIONS}
+        names = set(index.type_files)
+        for adjacency in relations.values():
+            for name, neighbours in adjacency.items():
+                if neighbours:
+                    names.add(name)
+                    names.update(neighbours)
+        nodes = sorted(names)
+        node_ids = {name: node_id for node_id, name in enumerate(nodes)}
+
+        arrays = {"flags": np.zeros(len(nodes), dtype=np.uint8)}
+        for name, file_path in index.type_files.items():
+            arrays["flags"][node_ids[name]] = DECLARED | (TEST if is_test_file(file_path) else 0)
+
+        for relation, adjacency in relations.items():
+            indptr = np.zeros(len(nodes) + 1, dtype=np.int64)
+            indices = []
+            for node_id, name in enumerate(nodes):
+                neighbours = sorted(node_ids[neighbour] for neighbour in adjacency.get(name, ()))
+                indices.extend(neighbours)
+                indptr[node_id + 1] = len(indices)
+            arrays[f"{relation}_indptr"] = indptr
+            arrays[f"{relation}_indices"] = np.array(indices, dtype=np.int32)
+        return cls(nodes, arrays)
+
+    def save(self, filename):
+        """
+        Write the graph as: magic, header length, JSON header (nodes and array layout), then
+        the raw arrays, each aligned on 8 bytes.
+        """
+        layout = {}
+        offset = 0
+        for name, array in self.arrays.items():
+            layout[name] = [array.dtype.str, offset, int(array.size)]
+            offset += self._aligned(array.nbytes)
+        header = json.dumps({"nodes": self.nodes, "arrays": layout}).encode('utf-8')
+        data_start = self._aligned(len(GRAPH_MAGIC) + 8 + len(header))
+
+        directory_path = os.path.dirname(filename)
+        if directory_path:
+            os.makedirs(directory_path, exist_ok=True)
+        # Written aside and renamed, so readers never map a partially written file
+        tmp_filename = filename + ".tmp"
+        with open(tmp_filename, 'wb') as f:
+            f.write(GRAPH_MAGIC)
+            f.write(len(header).to_bytes(8, 'little'))
+            f.write(header)
+            f.write(b"\0" * (data_start - f.tell()))
+            for name, array in self.arrays.items():
+                data = np.ascontiguousarray(array).tobytes()
+                f.write(data)
+                f.write(b"\0" * (self._aligned(len(data)) - len(data)))
+        os.replace(tmp_filename, filename)
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Load a graph written by save, memory mapping its arrays.
+        """
+        with open(filename, 'rb') as f:
+            if f.read(len(GRAPH_MAGIC)) != GRAPH_MAGIC:
+                raise ValueError(f"{filename} is not a project graph file")
+            header_length = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(header_length).decode('utf-8'))
+        data_start = cls._aligned(len(GRAPH_MAGIC) + 8 + header_length)
+
+        arrays = {}
+        for name, (dtype, offset, size) in header["arrays"].items():
+            if size == 0:
+                # Empty files regions cannot be mapped
+                arrays[name] = np.empty(0, dtype=dtype)
+            else:
+                arrays[name] = np.memmap(filename, dtype=dtype, mode='r', offset=data_start + offset, shape=(size,))
+        return cls(header["nodes"], arrays)
+
+    @classmethod
+    def load_or_build(cls, filename, project_directory):
+        """
+        Load the graph file of a project, or, when it does not exist yet, build the graph by
+        indexing the project directory and save it to that file.
+        """
+        if os.path.exists(filename):
+            return cls.load(filename)
+        from refAgent.dependency_graph import JavaProjectDependencyIndex
+        print(f"{filename} not found, building the dependency graph of {project_directory}")
+        index = JavaProjectDependencyIndex()
+        index.analyze_project(project_directory)
+        graph = cls.from_index(index)
+        graph.save(filename)
+        return graph
+
+    @staticmethod
+    def _aligned(size):
+        return (size + 7) // 8 * 8
+
+    def neighbours(self, relation, node_id):
+        indptr = self.arrays[f"{relation}_indptr"]
+        return self.arrays[f"{relation}_indices"][indptr[node_id]:indptr[node_id + 1]]
+
+    def contains(self, target_class):
+        node_id = self.node_ids.get(target_class)
+        if node_id is None:
+            return False
+        return any(len(self.neighbours(relation, node_id)) > 0 for relation in ("dependents", "supertypes", "callers"))
+
+    def project_classes(self, include_tests=False):
+        """
+        Names of the types declared in the project.
+        """
+        flags = self.arrays["flags"]
+        return [name for node_id, name in enumerate(self.nodes)
+                if flags[node_id] & DECLARED and (include_tests or not flags[node_id] & TEST)]
+
+    def dependency_slice(self, target_class):
+        """
+        Slice the dependency subgraph of a class: the target, the classes depending on it and,
+        transitively, their supertypes.
+        :return: The node names in visiting order and the edges as (source, target) name pairs,
+                 or None if the class has no dependencies in the project.
+        """
+        if not self.contains(target_class):
+            return None
+
+        target_id = self.node_ids[target_class]
+        slice_ids = [target_id]
+        seen = {target_id}
+        queue = deque([target_id])
+        while queue:
+            node_id = queue.popleft()
+            successors = self.neighbours("supertypes", node_id)
+            if node_id == target_id:
+                # Both arrays are sorted by id, which is also the name order
+                successors = np.union1d(successors, self.neighbours("dependents", target_id))
+            for successor in successors.tolist():
+                if successor not in seen:
+                    seen.add(successor)
+                    slice_ids.append(successor)
+                    queue.append(successor)
+
+        edges = []
+        for node_id in slice_ids:
+            edges.extend((node_id, base_id) for base_id in self.neighbours("supertypes", node_id).tolist())
+        edges.extend((target_id, dependent_id) for dependent_id in self.neighbours("dependents", target_id).tolist())
+        edges.extend((caller_id, target_id) for caller_id in self.neighbours("callers", target_id).tolist()
+                     if caller_id in seen)
+        return ([self.nodes[node_id] for node_id in slice_ids],
+                [(self.nodes[source], self.nodes[target]) for source, target in edges])
+
+    def dependency_subgraph(self, target_class):
+        """
+        Same as JavaProjectDependencyIndex.dependency_subgraph, answered from the compact graph.
+        :return: networkx.DiGraph, or None if the class has no dependencies in the project.
+        """
+        dependency_slice = self.dependency_slice(target_class)
+        if dependency_slice is None:
+            return None
+        nodes, edges = dependency_slice
+        graph = nx.DiGraph()
+        graph.add_nodes_from(nodes)
+        graph.add_edges_from(edges)
+        return graph
+
+    def dependency_tests(self, target_class):
+        """
+        Test classes of the project in the dependency subgraph of a class, in name order: the
+        tests to run after changing it when no TestSelector of the project is at hand.
+        """
+        dependency_slice = self.dependency_slice(target_class)
+        if dependency_slice is None:
+            return []
+        flags = self.arrays["flags"]
+        return sorted(name for name in dependency_slice[0]
+                      if flags[self.node_ids[name]] & TEST and is_test_class(name))
@@ -0,0 +1,213 @@
+import argparse
+import json
+import os
+import subprocess
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+REFACTORING_MINER = "./RefactoringMiner/RefactoringMiner-3.0.9/bin/RefactoringMiner"
+
+def refactoring_output_file(output_folder, commit_id):
+    return f"{output_folder}/refactoring_{commit_id}.json"
+
+def _mine_commit(executable, clone_dir, commit_id, output_folder, timeout):
+    """
+    Mine one commit of the local clone with -c, straight into its output file.
+    """
+    output_file = refactoring_output_file(output_folder, commit_id)
+    command = [executable, "-c", clone_dir, commit_id, "-json", output_file]
+    try:
+        subprocess.run(command, check=True, capture_output=True, text=True, timeout=timeout)
+        return os.path.exists(output_file)
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as e:
+        print(f"Error running RefactoringMiner for commit {commit_id}: {e}")
+        return False
+
+def _mine_batch(executable, clone_dir, batch, output_folder, timeout):
+    """
+    Mine a batch of commits in one JVM and split the output into one JSON file per commit.
+    :param batch: ("range", start, end, commit_ids) analysed with -bc (start excluded), or ("commit", commit_id).
+    :return: Number of commits whose output was written.
+    """
+    if batch[0] == "commit":
+        return int(_mine_commit(executable, clone_dir, batch[1], output_folder, timeout))
+
+    kind, start, end, commit_ids = batch
+    batch_file = os.path.join(output_folder, f".batch_{start[:12]}_{end[:12]}.json")
+    command = [executable, "-bc", clone_dir, start, end, "-json", batch_file]
+    mined = {}
+    try:
+        subprocess.run(command, check=True, capture_output=True, text=True, timeout=timeout)
+        with open(batch_file, 'r') as f:
+            mined = {commit["sha1"]: commit for commit in json.load(f).get("commits", [])}
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError, json.JSONDecodeError) as e:
+        print(f"Error running RefactoringMiner for commits {start}..{end}: {e}")
+    finally:
+        if os.path.exists(batch_file):
+            os.remove(batch_file)
+
+    written = 0
+    for commit_id in commit_ids:
+        if commit_id in mined:
+            with open(refactoring_output_file(output_folder, commit_id), 'w') as f:
+                json.dump({"commits": [mined[commit_id]]}, f, indent=4)
+            written += 1
+        # Commits the range walk did not reach (e.g. on another branch) are mined on their own
+        elif _mine_commit(executable, clone_dir, commit_id, output_folder, timeout):
+            written += 1
+    return written
+
+
+class RefactoringMinerRunner:
+    def __init__(self, repo_url, clone_dir, executable=REFACTORING_MINER, workers=4, batch_size=50, max_span=200,
+                 max_gap=4, min_density=0.5, timeout=None):
+        """
+        Run RefactoringMiner on many commits of a repository: the repository is cloned once and
+        the commits are analysed in batches, one JVM per batch, spread over a process pool.
+        :param repo_url: URL of the repository.
+        :param clone_dir: Folder of the local clone (reused and fetched if it already exists).
+        :param executable: Path to the RefactoringMiner launcher.
+        :param workers: Number of batches analysed in parallel.
+        :param batch_size: Maximum number of requested commits per batch.
+        :param max_span: Maximum number of history commits covered by a batch, so sparse commits
+                         do not make a batch analyse long stretches of unrequested history.
+        :param max_gap: Maximum distance in the history between two consecutive commits of a batch.
+        :param min_density: Minimum share of requested commits among the commits a range analyses,
+                            below it the commits are analysed with -c.
+        :param timeout: Timeout of one RefactoringMiner invocation in seconds.
+        """
+        self.repo_url = repo_url
+        self.clone_dir = clone_dir
+        self.executable = os.path.abspath(executable) if os.path.exists(executable) else executable
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_span = max_span
+        self.max_gap = max_gap
+        self.min_density = min_density
+        self.timeout = timeout
+        self._cloned = False
+
+    def clone(self):
+        """
+        Clone the repository, or fetch it when the clone already exists.
+        """
+        if self._cloned:
+            return
+        if os.path.isdir(os.path.join(self.clone_dir, ".git")):
+            subprocess.run(["git", "-C", self.clone_dir, "fetch", "--quiet", "--all"], capture_output=True, text=True)
+        else:
+            os.makedirs(os.path.dirname(self.clone_dir) or ".", exist_ok=True)
+            subprocess.run(["git", "clone", "--quiet", self.repo_url, self.clone_dir], check=True, capture_output=True, text=True)
+        self._cloned = True
+
+    def history(self, branch=None):
+        """
+        Commits of a branch (all branches by default), oldest first.
+        """
+        revisions = [branch] if branch else ["--all"]
+        process = subprocess.run(["git", "-C", self.clone_dir, "rev-list", "--topo-order", "--reverse"] + revisions,
+                                 check=True, capture_output=True, text=True)
+        return process.stdout.split()
+
+    def _git_lines(self, *arguments):
+        process = subprocess.run(["git", "-C", self.clone_dir] + list(arguments), capture_output=True, text=True)
+        return process.stdout.split() if process.returncode == 0 else None
+
+    def make_batches(self, commit_ids, history):
+        """
+        Group the commits into ranges of the history analysed with -bc. A range starts at the
+        first parent of its first commit and only keeps the commits it really contains (commits
+        of other branches next in the topological order are not ancestors of its end). A new range
+        starts when the next commit is more than max_gap commits away, and a range where the requested
+        commits are less than min_density of the analysed ones is dropped, since -bc analyses every
+        commit between start and end. Commits outside any range, or that would form a range of one,
+        are analysed with -c.
+        """
+        positions = {commit_id: position for position, commit_id in enumerate(history)}
+        batches = [("commit", commit_id) for commit_id in commit_ids if commit_id not in positions]
+
+        groups = []
+        for position, commit_id in sorted((positions[commit_id], commit_id) for commit_id in commit_ids if commit_id in positions):
+            if (groups and len(groups[-1]) < self.batch_size and position - groups[-1][0][0] < self.max_span
+                    and position - groups[-1][-1][0] <= self.max_gap):
+                groups[-1].append((position, commit_id))
+            else:
+                groups.append([(position, commit_id)])
+
+        for group in groups:
+            group_ids = [commit_id for position, commit_id in group]
+            start = None
+            while len(group_ids) > 1:
+                start = self._git_lines("rev-parse", "--verify", "--quiet", f"{group_ids[0]}^")
+                if start:
+                    start = start[0]
+                    break
+                # A root commit has no commit before it to start a range from
+                batches.append(("commit", group_ids.pop(0)))
+            if len(group_ids) == 1:
+                batches.append(("commit", group_ids[0]))
+                continue
+
+            end = group_ids[-1]
+            in_range = self._git_lines("rev-list", f"{start}..{end}")
+            if in_range is None or len(in_range) > self.max_span:
+                batches.extend(("commit", commit_id) for commit_id in group_ids)
+                continue
+            in_range_ids = set(in_range)
+            ranged = [commit_id for commit_id in group_ids if commit_id in in_range_ids]
+            batches.extend(("commit", commit_id) for commit_id in group_ids if commit_id not in in_range_ids)
+            if len(ranged) > 1 and len(ranged) >= self.min_density * len(in_range):
+                batches.append(("range", start, end, ranged))
+            else:
+                batches.extend(("commit", commit_id) for commit_id in ranged)
+        return batches
+
+    def run(self, commit_ids, output_folder, branch=None):
+        """
+        Mine the commits whose output JSON does not exist yet.
+        :param commit_ids: Commits to mine, or None for every commit of the branch.
+        :param output_folder: Folder receiving refactoring_<commit>.json for every commit.
+        :param branch: Branch whose history orders the commits (all branches by default).
+        :return: Number of commits mined.
+        """
+        os.makedirs(output_folder, exist_ok=True)
+        self.clone()
+        history = self.history(branch)
+        if commit_ids is None:
+            commit_ids = history
+
+        pending = [commit_id for commit_id in dict.fromkeys(commit_ids)
+                   if not os.path.exists(refactoring_output_file(output_folder, commit_id))]
+        print(f"{len(commit_ids) - len(pending)} commits already mined, {len(pending)} to mine")
+        if not pending:
+            return 0
+
+        batches = self.make_batches(pending, history)
+        mined = 0
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(_mine_batch, self.executable, self.clone_dir, batch, output_folder, self.timeout)
+                       for batch in batches]
+            for future in as_completed(futures):
+                mined += future.result()
+                print(f"RefactoringMiner: {mined}/{len(pending)} commits mined")
+        return mined
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mine the refactorings of repository commits with RefactoringMiner")
+    parser.add_argument("repo", type=str, help="Repository as owner/name")
+    parser.add_argument("--commits", type=str, default=None,
+                        help="JSON file {\"<name>\": [commit ids]} written by GitHubAPI.export_commits_to_json (all commits by default)")
+    parser.add_argument("--branch", type=str, default=None, help="Branch whose commits are mined")
+    parser.add_argument("--workers", type=int, default=4, help="Number of RefactoringMiner processes")
+    parser.add_argument("--batch-size", type=int, default=50, help="Maximum number of commits per RefactoringMiner invocation")
+    args = parser.parse_args()
+
+    repo_owner, repo_name = args.repo.split("/")
+    commit_ids = None
+    if args.commits:
+        with open(args.commits, 'r') as f:
+            commit_ids = [commit_id for ids in json.load(f).values() for commit_id in ids]
+
+    runner = RefactoringMinerRunner(f"https://github.com/{repo_owner}/{repo_name}.git", f"data/clones/{repo_owner}/{repo_name}",
+                                    workers=args.workers, batch_size=args.batch_size)
+    runner.run(commit_ids, f"data/refactoring_types/developers/{repo_name}", branch=args.branch)
@@ -0,0 +1,72 @@
+import argparse
+import os
+import matplotlib
+from concurrent.futures import ProcessPoolExecutor
+from refAgent.dependency_graph import draw_dependency_graph
+from refAgent.project_graph import ProjectGraph
+
+# Project graph of the rendering process, memory mapped once by the pool initializer
+_graph = None
+
+def _load_graph(graph_file):
+    global _graph
+    # Headless rendering. pyplot may already be loaded with another backend (e.g. when imported from
+    # RefAgent_main, or in a forked worker), so the backend is switched here rather than at import time
+    matplotlib.use("Agg", force=True)
+    _graph = ProjectGraph.load(graph_file)
+
+def render_graph(target_class, output_dir, graph_mtime, force=False):
+    """
+    Render the dependency graph of one class from the project graph of the process.
+    :return: The path of the PNG, or None if it was up to date or the class has no dependencies.
+    """
+    png_file = os.path.join(output_dir, f"{target_class}_dependency_graph.png")
+    if not force and os.path.exists(png_file) and os.path.getmtime(png_file) >= graph_mtime:
+        return None
+    graph = _graph.dependency_subgraph(target_class)
+    if graph is None:
+        return None
+    draw_dependency_graph(graph, filename=png_file)
+    return png_file
+
+def render_graphs(graph_file, output_dir=None, classes=None, workers=None, force=False):
+    """
+    Render the PNG of the dependency graph of every class of a project in a process pool.
+    Rendering is a post-processing step: the refactoring pipeline only writes the project graph.
+    :param graph_file: Project graph written by ProjectGraph.save (e.g. data/graphs/<project>/project_graph.bin).
+    :param output_dir: Folder receiving the <class>_dependency_graph.png files (defaults to the folder of the graph).
+    :param classes: Classes to render (defaults to all the non-test classes declared in the project).
+    :param workers: Number of rendering processes (defaults to the number of CPUs).
+    :param force: Render the graphs whose PNG is newer than the project graph again.
+    :return: Number of rendered graphs.
+    """
+    output_dir = output_dir or os.path.dirname(graph_file)
+    os.makedirs(output_dir, exist_ok=True)
+    if classes is None:
+        classes = ProjectGraph.load(graph_file).project_classes()
+    graph_mtime = os.path.getmtime(graph_file)
+
+    rendered = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_load_graph, initargs=(graph_file,)) as executor:
+        futures = {executor.submit(render_graph, target_class, output_dir, graph_mtime, force): target_class
+                   for target_class in classes}
+        for future, target_class in futures.items():
+            try:
+                if future.result() is not None:
+                    rendered += 1
+            except Exception as e:
+                print(f"Cannot render the dependency graph of {target_class}: {e}")
+    print(f"Rendered {rendered} of {len(classes)} dependency graphs in {output_dir}")
+    return rendered
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Render the dependency graphs of a project as PNG files")
+    parser.add_argument("project_name", type=str, help="Name of the project folder (e.g. accumulo-2.1)")
+    parser.add_argument("--classes", nargs="+", default=None, help="Only render these classes")
+    parser.add_argument("--workers", type=int, default=None, help="Number of rendering processes")
+    parser.add_argument("--force", action="store_true", help="Render graphs whose PNG is up to date again")
+    args = parser.parse_args()
+
+    render_graphs(f"data/graphs/{args.project_name}/project_graph.bin", classes=args.classes,
+                  workers=args.workers, force=args.force)
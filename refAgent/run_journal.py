@@ -0,0 +1,135 @@
+import json
+import os
+import threading
+import time
+from collections import Counter
+
+class RunJournal:
+    def __init__(self, path):
+        """
+        Append-only JSONL journal of the stages completed for each class of a run, so an
+        interrupted run resumes at the stage it stopped at instead of starting over.
+        Every line is one record {"file", "stage", "iteration", "value", "time"}.
+        :param path: Path to the journal file (e.g. results/<project>/run_journal.jsonl).
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.last_stage = {}
+        self._load()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+        if self._truncated:
+            # Start the next record on its own line after a partially written one
+            self._file.write("\n")
+
+    def _load(self):
+        self._truncated = False
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                self._truncated = not line.endswith("\n")
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A record cut short by a crash, the stage is simply redone
+                    continue
+                self._remember(entry)
+
+    def _remember(self, entry):
+        key = (entry["stage"], entry.get("iteration"))
+        self.stages.setdefault(entry["file"], {})[key] = entry["value"]
+        self.last_stage[entry["file"]] = entry["stage"]
+
+    def record(self, file, stage, value=True, iteration=None):
+        """
+        Record that a stage of a class is complete.
+        :param file: Java file of the class.
+        :param stage: Name of the stage (e.g. "instruction", "compile").
+        :param value: JSON-serializable result of the stage, replayed on resume.
+        :param iteration: Refactoring iteration of the stage, if any.
+        """
+        entry = {"file": file, "stage": stage, "iteration": iteration, "value": value, "time": time.time()}
+        line = json.dumps(entry)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._remember(entry)
+
+    def get(self, file, stage, iteration=None, default=None):
+        """
+        Return the recorded result of a stage, or default if the stage was not completed.
+        """
+        with self._lock:
+            return self.stages.get(file, {}).get((stage, iteration), default)
+
+    def has(self, file, stage, iteration=None):
+        with self._lock:
+            return (stage, iteration) in self.stages.get(file, {})
+
+    def run(self, file, stage, compute, iteration=None):
+        """
+        Return the recorded result of a stage, calling compute() and recording its result
+        only when the stage was not completed in a previous run. Nothing is recorded when
+        compute() raises, so a failed stage (e.g. an LLM error) is computed again on the next run.
+        """
+        with self._lock:
+            stages = self.stages.get(file, {})
+            if (stage, iteration) in stages:
+                return stages[(stage, iteration)]
+        value = compute()
+        self.record(file, stage, value, iteration=iteration)
+        return value
+
+    def is_done(self, file):
+        return self.has(file, "done")
+
+    def summary(self, total=None):
+        """
+        Summarize the progress of the run from the journal alone.
+        :param total: Number of classes of the project, if known.
+        :return: Dictionary with the number of started, done, accepted and failed classes, the
+                 candidate improvements attempted and accepted, and the number of classes whose
+                 last completed stage is each stage.
+        """
+        with self._lock:
+            done = [file for file, stages in self.stages.items() if ("done", None) in stages]
+            summary = {
+                "started": len(self.stages),
+                "done": len(done),
+                "accepted": sum(1 for file in done if self.stages[file][("done", None)].get("is improved")),
+                "failed": sum(1 for stage in self.last_stage.values() if stage == "failed"),
+                "candidates": dict(sum((Counter(self.stages[file][("done", None)].get("Candidates", {})) for file in done),
+                                       Counter())),
+                "last stage": dict(Counter(stage for file, stage in self.last_stage.items()
+                                           if ("done", None) not in self.stages[file])),
+            }
+        if total is not None:
+            summary["total"] = total
+            summary["remaining"] = total - summary["done"]
+        return summary
+
+    def as_string(self, total=None):
+        summary = self.summary(total)
+        lines = [f"Run journal {self.path}:"]
+        if total is not None:
+            lines.append(f"  {summary['done']}/{total} classes done, {summary['remaining']} remaining")
+        else:
+            lines.append(f"  {summary['done']} classes done")
+        lines.append(f"  {summary['accepted']} improvements accepted, {summary['failed']} classes failed, "
+                     f"{summary['started'] - summary['done']} in progress")
+        if summary["candidates"]:
+            lines.append(f"  {summary['candidates'].get('accepted', 0)} of {summary['candidates'].get('attempted', 0)} "
+                         f"candidate improvements accepted ({summary['candidates'].get('rejected', 0)} rejected by the syntax gate, "
+                         f"{summary['candidates'].get('passed tests', 0)} passed the tests)")
+        for stage, count in sorted(summary["last stage"].items()):
+            lines.append(f"    stopped after {stage}: {count}")
+        return "\n".join(lines)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -1,5 +1,6 @@
 from utilities import *
 from OpenaiLLM import OpenAILLM
+from refAgent.project_graph import ProjectGraph
 import sys
 from settings import Settings
 
@@ -17,6 +18,9 @@ if __name__ == "__main__":
     export_java_files_to_json(f"projects/{protject_name}", f"single_agent_results/data/paths/{protject_name}/{protject_name}_files.json")
     files = read_json_file(f"single_agent_results/data/paths/{protject_name}/{protject_name}_files.json")
     files = find_non_test_files(files)
+
+    # Dependency graph of the whole project, written by RefAgent_main or built here if it has not run
+    project_graph = ProjectGraph.load_or_build(f"data/graphs/{protject_name}/project_graph.bin", f"projects/{protject_name}")
     for file in files:
         results = {}
         results["Compilation"] = True
@@ -79,18 +83,14 @@ if __name__ == "__main__":
                 continue
 
             print("------------ Test the improved code ---------------------------------------")
-            graph_path = f"data/graphs/{protject_name}/{target_class}_dependency_graph.json"
-            graph_dep = read_json_file(graph_path)
-            files = extract_ids(graph_dep)
-            tests = find_test_files(files)
+            tests = project_graph.dependency_tests(target_class)
             for test in tests:
-                if test!="TestCase":
-                    rcode = run_maven_test(test, project_dir=project_directory, verify=False)
-                    if rcode.returncode != 0:
-                        results["Compilation"] = True
-                        results["Test passed"] = False
-                        results["is improved"] = False
-                        break
+                rcode = run_maven_test(test, project_dir=project_directory, verify=False)
+                if rcode.returncode != 0:
+                    results["Compilation"] = True
+                    results["Test passed"] = False
+                    results["is improved"] = False
+                    break
                 
             write_to_java_file(file_path=path_to_java_file_after, java_code=java_code)
             export_dict_to_json(results, f"single_agent_results/results/{protject_name}/{target_class}/metrics")
@@ -1,5 +1,6 @@
 from refAgent.java_metrics_calculator import JavaMetricsCalculator
-from dependency_graph import JavaClassDependencyAnalyzer, draw_dependency_graph
+from dependency_graph import draw_dependency_graph
+from refAgent.project_graph import ProjectGraph
 from utilities import *
 from OpenaiLLM import OpenAILLM
 import sys
@@ -19,6 +20,9 @@ if __name__ == "__main__":
     export_java_files_to_json(f"projects/{protject_name}", f"data/paths/{protject_name}/{protject_name}_files.json")
     files = read_json_file(f"data/paths/{protject_name}/{protject_name}_files.json")
     files = find_non_test_files(files)
+
+    # Dependency graph of the whole project, written by RefAgent_main or built here if it has not run
+    project_graph = ProjectGraph.load_or_build(f"data/graphs/{protject_name}/project_graph.bin", f"projects/{protject_name}")
     for file in files:
         try:
             project_directory = f"projects/{protject_name}"
@@ -29,12 +33,9 @@ if __name__ == "__main__":
                 continue
             os.makedirs(f"results/{protject_name}/{target_class}", exist_ok=True)
 
-            graph_path = f"data/graphs/{protject_name}/{target_class}_dependency_graph.json"
-            
-            analyzer = JavaClassDependencyAnalyzer(target_class)
-            analyzer.analyze_project(project_directory)
-            analyzer.export_to_json(graph_path)
-            draw_dependency_graph(analyzer.dependencies, filename=f"data/graphs/{protject_name}/{target_class}_dependency_graph.png")
+            dependency_graph = project_graph.dependency_subgraph(target_class)
+            if dependency_graph is not None:
+                draw_dependency_graph(dependency_graph, filename=f"data/graphs/{protject_name}/{target_class}_dependency_graph.png")
             
             # 1. For a single file
             input_path = "code_smells/project/before"  # Path to the Java code directory
@@ -97,16 +98,13 @@ if __name__ == "__main__":
                 continue
 
             print("------------ Test the improved code ---------------------------------------")
-            graph_dep = read_json_file(graph_path)
-            files = extract_ids(graph_dep)
-            tests = find_test_files(files)
+            tests = project_graph.dependency_tests(target_class)
             for test in tests:
-                if test!="TestCase":
-                    rcode = run_maven_test(test, project_dir=project_directory, verify=False)
-                    if rcode.returncode != 0:
-                        results["Compilation"] = True
-                        results["Test passed"] = False
-                        results["is improved"] = False  
+                rcode = run_maven_test(test, project_dir=project_directory, verify=False)
+                if rcode.returncode != 0:
+                    results["Compilation"] = True
+                    results["Test passed"] = False
+                    results["is improved"] = False  
             print("------------- Commit the code changes to github-------------------")
 
             # Example usage
@@ -0,0 +1,117 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+class SQLiteCache:
+    def __init__(self, db_path, max_entries=None, max_bytes=None, ttl=None):
+        """
+        Persistent key/value store backed by SQLite, with least-recently-used eviction
+        and hit/miss counters. Values are stored as JSON.
+        :param db_path: Path to the SQLite database file.
+        :param max_entries: Maximum number of entries kept (None for no limit).
+        :param max_bytes: Maximum total size of the stored values in bytes (None for no limit).
+        :param ttl: Time to live of an entry in seconds (None for no expiry).
+        """
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(db_path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+        self._connection.commit()
+
+    def get(self, key):
+        """
+        Return the value stored under a key, or None on a miss or an expired entry.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+                if row is not None:
+                    self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self._connection.commit()
+                self.misses += 1
+                return None
+            self._connection.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+            self._connection.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        """
+        Store a JSON-serializable value under a key and evict old entries if the cache is over its limits.
+        """
+        data = json.dumps(value)
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data), now, now)
+            )
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self):
+        if self.ttl is not None:
+            cursor = self._connection.execute("DELETE FROM entries WHERE created_at < ?", (time.time() - self.ttl,))
+            self.evictions += cursor.rowcount
+        if self.max_entries is not None:
+            count = self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            if count > self.max_entries:
+                cursor = self._connection.execute(
+                    "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY last_access LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+                self.evictions += cursor.rowcount
+        if self.max_bytes is not None:
+            total = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            while total > self.max_bytes:
+                row = self._connection.execute(
+                    "SELECT key, size FROM entries ORDER BY last_access LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    break
+                self._connection.execute("DELETE FROM entries WHERE key = ?", (row[0],))
+                self.evictions += 1
+                total -= row[1]
+
+    def stats(self):
+        """
+        Return the hit/miss counters and the current size of the cache.
+        """
+        with self._lock:
+            entries, size = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups > 0 else 0,
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": size
+        }
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
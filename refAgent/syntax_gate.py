@@ -0,0 +1,87 @@
+import re
+import javalang
+
+# Opening fence (with an optional language tag) and the code up to the closing fence or the end of the reply
+CODE_BLOCK_PATTERN = re.compile(r"```[ \t]*([\w+#-]*)[ \t]*\n(.*?)(?:\n[ \t]*```|\Z)", re.DOTALL)
+
+def extract_code_block(reply):
+    """
+    Extract the Java code of an LLM reply. Prefers the longest block tagged java, then the
+    longest block; a block whose closing fence is missing (truncated reply) runs to the end.
+    Replies without any fence are returned as they are.
+    """
+    blocks = CODE_BLOCK_PATTERN.findall(reply)
+    if not blocks:
+        return reply.strip()
+    java_blocks = [code for language, code in blocks if language.lower() == "java"]
+    return max(java_blocks or [code for language, code in blocks], key=len).strip()
+
+def _type_name(type_node):
+    if type_node is None:
+        return "void"
+    name = type_node.name
+    sub_type = getattr(type_node, 'sub_type', None)
+    while sub_type is not None:
+        name += "." + sub_type.name
+        sub_type = getattr(sub_type, 'sub_type', None)
+    return name + "[]" * len(type_node.dimensions or [])
+
+def _signature(method):
+    parameters = tuple(_type_name(parameter.type) + ("..." if parameter.varargs else "") for parameter in method.parameters)
+    return_type = _type_name(method.return_type) if isinstance(method, javalang.tree.MethodDeclaration) else None
+    return (method.name, parameters, return_type)
+
+def public_api(tree):
+    """
+    Map the public top-level types of a compilation unit to the signatures (name, parameter
+    types, return type) of their public methods and constructors.
+    """
+    api = {}
+    for type_declaration in tree.types:
+        if 'public' not in type_declaration.modifiers:
+            continue
+        members = list(getattr(type_declaration, 'constructors', None) or []) + list(type_declaration.methods)
+        api[type_declaration.name] = {_signature(member) for member in members if 'public' in member.modifiers}
+    return api
+
+def _format_signature(signature):
+    name, parameters, return_type = signature
+    return f"{return_type + ' ' if return_type else ''}{name}({', '.join(parameters)})"
+
+class SyntaxGate:
+    def __init__(self, original_code):
+        """
+        In-process check of LLM improvements run before Maven: the candidate must parse and keep
+        the public types and public method signatures of the original class.
+        :param original_code: Java source code of the class before the refactoring.
+        """
+        try:
+            self.original_api = public_api(javalang.parse.parse(original_code))
+        except (javalang.parser.JavaSyntaxError, javalang.tokenizer.LexerError):
+            # Nothing to compare with, candidates only have to parse
+            self.original_api = None
+
+    def check(self, candidate_code):
+        """
+        Check a candidate.
+        :return: The reason of the rejection, or None if the candidate passes the gate.
+        """
+        if not candidate_code.strip():
+            return "Empty reply"
+        try:
+            tree = javalang.parse.parse(candidate_code)
+        except javalang.parser.JavaSyntaxError as e:
+            return f"Does not parse: {e.description if hasattr(e, 'description') else e}"
+        except (javalang.tokenizer.LexerError, StopIteration) as e:
+            return f"Does not parse: {e}"
+        if self.original_api is None:
+            return None
+
+        candidate_api = public_api(tree)
+        for type_name, signatures in self.original_api.items():
+            if type_name not in candidate_api:
+                return f"Public type {type_name} is missing"
+            missing = sorted(signatures - candidate_api[type_name])
+            if missing:
+                return f"Public signatures of {type_name} changed: {', '.join(_format_signature(s) for s in missing)}"
+        return None
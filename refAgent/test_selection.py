@@ -0,0 +1,106 @@
+import fnmatch
+import json
+from collections import defaultdict, deque
+from utilities import is_test_file
+
+# Test classes picked up by the default includes of maven-surefire-plugin
+SUREFIRE_TEST_PATTERNS = ("Test*", "*Test", "*Tests", "*TestCase")
+
+def is_test_class(class_name):
+    return any(fnmatch.fnmatchcase(class_name, pattern) for pattern in SUREFIRE_TEST_PATTERNS)
+
+class TestSelector:
+    def __init__(self, dependency_index, coverage=None):
+        """
+        Change-impact test selection: maps every production class to the test classes that
+        reach it, directly or transitively, through the references of the project.
+        :param dependency_index: JavaProjectDependencyIndex of the project (facts must include the references).
+        :param coverage: Optional dictionary mapping test classes to the classes their run covers,
+                         see load_coverage. A test with coverage data is selected from its coverage
+                         instead of from the static references.
+        """
+        self.dependency_index = dependency_index
+        self.coverage = coverage or {}
+        self.tests = []
+        self.impacted_tests = defaultdict(set)
+        self.built = False
+        self.error = None
+
+    @staticmethod
+    def load_coverage(coverage_file):
+        """
+        Read per-test coverage from a JSON file {"test class": ["covered class", ...]}.
+        Qualified (a.b.C) and binary (C$Inner) names are reduced to simple class names.
+        """
+        with open(coverage_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        def simple_name(name):
+            return name.split(".")[-1].split("$")[0]
+
+        return {simple_name(test): {simple_name(name) for name in covered} for test, covered in data.items()}
+
+    def build(self):
+        """
+        Precompute the impacted tests of every class, once per project.
+        """
+        index = self.dependency_index
+        known_types = set(index.type_files)
+
+        # A test reaches what it references and, since calls through a supertype may run any
+        # of its implementations, the subtypes of what it reaches
+        uses = defaultdict(set)
+        for type_name, referenced in index.references.items():
+            uses[type_name].update(referenced & known_types)
+        for type_name, bases in index.supertypes.items():
+            for base in bases:
+                if base in known_types and type_name in known_types:
+                    uses[base].add(type_name)
+
+        self.tests = sorted(type_name for type_name, file_path in index.type_files.items()
+                            if is_test_file(file_path) and is_test_class(type_name)
+                            and type_name not in index.abstract_types)
+        self.impacted_tests = defaultdict(set)
+        for test in self.tests:
+            if test in self.coverage:
+                reached = self.coverage[test]
+            else:
+                reached = self._reachable(test, uses)
+            for type_name in reached:
+                self.impacted_tests[type_name].add(test)
+        self.built = True
+        return self
+
+    @staticmethod
+    def _reachable(start, uses):
+        seen = {start}
+        queue = deque([start])
+        while queue:
+            for used in uses.get(queue.popleft(), ()):
+                if used not in seen:
+                    seen.add(used)
+                    queue.append(used)
+        return seen
+
+    def fail(self, error):
+        """
+        Record that the dependency index could not be built, so the selection is not available.
+        """
+        self.error = error
+        print(f"Test selection unavailable, the dependency index failed: {type(error).__name__}: {error}")
+
+    def tests_for(self, class_name):
+        """
+        Return the test classes to run after changing a class, in name order, or None when the
+        selection is not available (not built, or its dependency index failed). An empty list means
+        that no test reaches the class, None that the full test suite has to run.
+        """
+        if not self.built or self.error is not None:
+            return None
+        return sorted(self.impacted_tests.get(class_name, ()))
+
+    def as_string(self):
+        selected = sum(len(tests) for tests in self.impacted_tests.values())
+        covered = len([name for name in self.impacted_tests if name not in self.tests])
+        return (f"Test selection: {len(self.tests)} test classes, {covered} classes with impacted tests, "
+                f"{selected / covered if covered else 0:.1f} tests per class on average")
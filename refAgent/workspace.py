@@ -0,0 +1,125 @@
+import os
+import queue
+import shutil
+import subprocess
+from contextlib import contextmanager
+
+class WorkerWorkspace:
+    def __init__(self, worker_id, project_name, root="workspaces", shared=False):
+        """
+        Scratch state of one refactoring worker: the DesigniteJava input/output folders of the after-code and
+        the copy of the after-project that is edited, compiled and tested.
+        :param worker_id: Index of the worker.
+        :param project_name: Name of the project being refactored.
+        :param root: Folder holding the per-worker workspaces.
+        :param shared: Use the historical shared locations (single worker runs) instead of a private copy.
+        """
+        self.worker_id = worker_id
+        self.project_name = project_name
+        self.before_project = f"projects/before/{project_name}"
+        self.shared_after_project = f"projects/after/{project_name}"
+        self.shared = shared
+
+        if shared:
+            self.root = "."
+            self.after_project = self.shared_after_project
+            code_smells = "code_smells"
+        else:
+            self.root = os.path.join(root, project_name, f"worker-{worker_id}")
+            self.after_project = os.path.join(self.root, "after")
+            code_smells = os.path.join(self.root, "code_smells")
+
+        self.metrics_after_input = os.path.join(code_smells, "project", "after")
+        self.metrics_after_output = os.path.join(code_smells, "tmp", "after")
+
+    def prepare(self, mode="copy"):
+        """
+        Create the scratch folders and a private copy of the after-project.
+        :param mode: "copy" for a copy-on-write copy of the tree (falls back to a plain copy on
+                     file systems without reflinks) or "worktree" for a detached git worktree.
+        """
+        for directory in [self.metrics_after_input, self.metrics_after_output]:
+            os.makedirs(directory, exist_ok=True)
+        if self.shared:
+            return
+
+        self.remove_after_project()
+        os.makedirs(os.path.dirname(self.after_project), exist_ok=True)
+        if mode == "worktree":
+            subprocess.run(["git", "-C", self.shared_after_project, "worktree", "add", "--force", "--detach",
+                            os.path.abspath(self.after_project), "HEAD"], check=True, capture_output=True, text=True)
+        else:
+            process = subprocess.run(["cp", "-a", "--reflink=auto", self.shared_after_project, self.after_project],
+                                     capture_output=True, text=True)
+            if process.returncode != 0:
+                shutil.copytree(self.shared_after_project, self.after_project, symlinks=True)
+        print(f"Workspace of worker {self.worker_id} is ready at {self.root}")
+
+    def remove_after_project(self):
+        if self.shared or not os.path.exists(self.after_project):
+            return
+        if os.path.isfile(os.path.join(self.after_project, ".git")):
+            # The tree is a git worktree of the shared after-project
+            subprocess.run(["git", "-C", self.shared_after_project, "worktree", "remove", "--force",
+                            os.path.abspath(self.after_project)], capture_output=True, text=True)
+            subprocess.run(["git", "-C", self.shared_after_project, "worktree", "prune"], capture_output=True, text=True)
+        if os.path.exists(self.after_project):
+            shutil.rmtree(self.after_project)
+
+    def relative_path(self, file):
+        """
+        Path of a file of the before-project relative to the project root.
+        """
+        return os.path.relpath(file, self.before_project)
+
+    def after_file(self, file):
+        """
+        Path, in this workspace's after-project, of a file of the before-project.
+        """
+        return os.path.join(self.after_project, self.relative_path(file))
+
+
+class WorkspacePool:
+    def __init__(self, project_name, workers=1, root="workspaces", mode="copy"):
+        """
+        Pool of isolated worker workspaces. A single worker keeps using the shared
+        code_smells/ and projects/after/ locations; several workers each get their own.
+        :param project_name: Name of the project being refactored.
+        :param workers: Number of workspaces (workers times candidates evaluated in parallel per class).
+        :param root: Folder holding the per-worker workspaces.
+        :param mode: How the after-project is copied ("copy" or "worktree").
+        """
+        shared = workers == 1
+        self.workspaces = [WorkerWorkspace(i, project_name, root=root, shared=shared) for i in range(workers)]
+        self._available = queue.Queue()
+        for workspace in self.workspaces:
+            workspace.prepare(mode)
+            self._available.put(workspace)
+
+    @contextmanager
+    def workspace(self):
+        """
+        Borrow a workspace for the duration of a with-block.
+        """
+        workspace = self._available.get()
+        try:
+            yield workspace
+        finally:
+            self._available.put(workspace)
+
+    @contextmanager
+    def workspace_group(self, count):
+        """
+        Borrow several workspaces for the duration of a with-block, e.g. to evaluate candidates in parallel.
+        The pool must hold count workspaces for every concurrent borrower.
+        """
+        workspaces = [self._available.get() for _ in range(count)]
+        try:
+            yield workspaces
+        finally:
+            for workspace in workspaces:
+                self._available.put(workspace)
+
+    def cleanup(self):
+        for workspace in self.workspaces:
+            workspace.remove_after_project()
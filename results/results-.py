@@ -1,19 +1,18 @@
 import os
-from utilities import (iterate_over_json_files, 
-                       iterate_over_json_files_by_codelements,
-                       read_all_metrics_in_folder, 
+from utilities import (read_all_metrics_in_folder, 
                        create_separate_metrics_boxplots,
-                       extract_code_element_types_from_files,
-                       extract_transactions,
+                       iter_transactions,
                        perform_association_rule_mining,
                        save_rules_to_excel,
                        compare_supports_from_excel)
 from collections import Counter
 import numpy as np
+from scipy import sparse
 import pandas as pd
 import seaborn as sns
 from collections import Counter
 from refAgent.metrics import *
+from refAgent.corpus_scanner import CorpusScanner
 import matplotlib.pyplot as plt
 
 def count_folders_in_directory(directory_path):
@@ -30,6 +29,33 @@ def count_folders_in_directory(directory_path):
         print(f"An error occurred: {e}")
         return 0
 
+def create_incidence_matrix(all_types, refactoring_types=None):
+    """
+    Creates a sparse one-hot incidence matrix of files and refactoring types.
+
+    Args:
+        all_types (dict): A dictionary with file names as keys and lists of refactoring types as values.
+        refactoring_types (list): Column labels, all the types found in all_types (sorted) by default.
+
+    Returns:
+        tuple: The files x types scipy CSR matrix (1 when the type occurs in the file), the
+               list of file names (rows) and the list of refactoring types (columns).
+    """
+    if refactoring_types is None:
+        refactoring_types = sorted(set(ref_type for types in all_types.values() for ref_type in types))
+    columns = {ref_type: column for column, ref_type in enumerate(refactoring_types)}
+
+    rows, cols = [], []
+    for row, types in enumerate(all_types.values()):
+        # Remove duplicate refactoring types in the same file
+        for column in set(columns[ref_type] for ref_type in types if ref_type in columns):
+            rows.append(row)
+            cols.append(column)
+
+    incidence = sparse.csr_matrix((np.ones(len(rows), dtype=np.int64), (rows, cols)),
+                                  shape=(len(all_types), len(refactoring_types)))
+    return incidence, list(all_types.keys()), refactoring_types
+
 def create_cooccurrence_matrix(all_types):
     """
     Creates a co-occurrence matrix of refactoring types across all files.
@@ -40,23 +66,36 @@ def create_cooccurrence_matrix(all_types):
     Returns:
         pd.DataFrame: A co-occurrence matrix of refactoring types.
     """
-    # Get all unique refactoring types
-    unique_refactoring_types = set()
-    for types in all_types.values():
-        unique_refactoring_types.update(set(types))
-    unique_refactoring_types = sorted(unique_refactoring_types)  # Sort for consistent ordering
+    incidence, _, refactoring_types = create_incidence_matrix(all_types)
 
-    # Create an empty DataFrame for the co-occurrence matrix
-    cooccurrence_matrix = pd.DataFrame(0, index=unique_refactoring_types, columns=unique_refactoring_types)
+    # Number of files in which both types occur, for every pair of types
+    cooccurrences = (incidence.T @ incidence).toarray()
+    return pd.DataFrame(cooccurrences, index=refactoring_types, columns=refactoring_types)
 
-    # Fill in the co-occurrence matrix
-    for types in all_types.values():
-        unique_types_in_file = set(types)  # Remove duplicate refactoring types in the same file
-        for ref_type_1 in unique_types_in_file:
-            for ref_type_2 in unique_types_in_file:
-                cooccurrence_matrix.loc[ref_type_1, ref_type_2] += 1
+def create_cooccurrence_matrices_by_group(all_types, groups):
+    """
+    Creates one co-occurrence matrix of refactoring types per group of files (e.g. per project
+    or per source), all labelled with the refactoring types of every file.
+
+    Args:
+        all_types (dict): A dictionary with file names as keys and lists of refactoring types as values.
+        groups (dict): A dictionary with file names as keys and group names as values.
+
+    Returns:
+        dict: Group names as keys and co-occurrence matrices (pd.DataFrame) as values.
+    """
+    incidence, file_names, refactoring_types = create_incidence_matrix(all_types)
+    group_rows = {}
+    for row, file_name in enumerate(file_names):
+        group_rows.setdefault(groups[file_name], []).append(row)
+
+    matrices = {}
+    for group, rows in group_rows.items():
+        group_incidence = incidence[rows]
+        matrices[group] = pd.DataFrame((group_incidence.T @ group_incidence).toarray(),
+                                       index=refactoring_types, columns=refactoring_types)
+    return matrices
 
-    return cooccurrence_matrix
 # Example usage:
 directory_path = 'results/javaxpath'
 num_folders = count_folders_in_directory(directory_path)
@@ -141,12 +180,15 @@ repo_names = ["closure-templates-release-2023-09-13",
              "javaxpath"]
 refactoring_types = set()
 import sys
+# Reads every RefactoringMiner file once, unchanged folders are loaded from the cache
+corpus_scanner = CorpusScanner()
 for repo_name in repo_names:
 
     #Refactoring analysis
     repo_path = f'data/refactoring_types/{repo_name}'  # Replace with the path to your repository containing JSON files
-    all_types = iterate_over_json_files(repo_path)
-    all_type_by_elements = iterate_over_json_files_by_codelements(repo_path)
+    corpus = corpus_scanner.scan(repo_path)
+    all_types = corpus.types_per_file
+    all_type_by_elements = corpus.code_elements_per_file
 
     # Count the number of files with and without refactorings
     non_empty_count = sum(1 for types in all_types.values() if types)  # Files with refactorings
@@ -296,9 +338,9 @@ create_separate_metrics_boxplots(llm_files, dev_files, metrics, repo_names)
 
 # Example usage
 folder_path = "data/refactoring_types/agents"  # Replace with the path to the folder containing JSON files
-all_results = extract_code_element_types_from_files(folder_path)
+all_results = corpus_scanner.scan(folder_path).code_element_types_per_file
 # Print results
-transactions = extract_transactions(all_results)
+transactions = iter_transactions(all_results)
 rules = perform_association_rule_mining(transactions, min_support=0.6, min_confidence=0.7)
 
 print(rules[['antecedents', 'consequents', 'support', 'confidence', 'lift']])
@@ -5,9 +5,14 @@ import pandas as pd
 import seaborn as sns
 import matplotlib.pyplot as plt
 import numpy as np
-from mlxtend.frequent_patterns import apriori, association_rules
+from scipy import sparse
+from mlxtend.frequent_patterns import apriori, fpgrowth, association_rules
 import shutil
 import os
+import glob
+import time
+import tempfile
+from xml.etree import ElementTree
 import git
 
 def parse_java_code(file_path):
@@ -15,27 +20,76 @@ def parse_java_code(file_path):
         java_code = f.read()
     return java_code
 
+# VCS metadata, IDE settings and generated code are neither refactored nor analysed, at any depth
+IGNORED_DIRECTORIES = {".git", ".svn", ".hg", ".idea", "node_modules", "generated-sources", "generated-test-sources"}
+
+# Build outputs are only skipped at the root of a module, as these names are also valid Java packages
+BUILD_OUTPUT_DIRECTORIES = {"target", "build", "out"}
+BUILD_FILES = {"pom.xml", "build.gradle", "build.gradle.kts", "settings.gradle", "settings.gradle.kts", "build.xml"}
+
+def is_test_file(file_path):
+    return "test" in str.lower(file_path)
+
+def discover_java_files(repo_path, ignored_directories=IGNORED_DIRECTORIES, manifest_file=None,
+                        build_output_directories=BUILD_OUTPUT_DIRECTORIES):
+    """
+    Walk a repository with os.scandir and yield its Java files as soon as they are found,
+    skipping the ignored directories instead of descending into them.
+
+    Args:
+        repo_path (str): Root folder of the repository.
+        ignored_directories (set): Names of the directories that are not walked, wherever they are.
+        manifest_file (str): Optional JSON file receiving the list of all the files found once the walk is over.
+        build_output_directories (set): Names of the directories that are not walked when they are next to
+            a build file (pom.xml, build.gradle, ...) or at the root of the repository.
+
+    Yields:
+        tuple: The path of a Java file and whether it is a test file.
+    """
+    java_files = [] if manifest_file else None
+    directories = [repo_path]
+    while directories:
+        directory = directories.pop()
+        try:
+            with os.scandir(directory) as iterator:
+                entries = sorted(iterator, key=lambda entry: entry.name)
+        except OSError as e:
+            print(f"Cannot list {directory}: {e}")
+            continue
+
+        module_root = directory == repo_path or any(entry.name in BUILD_FILES for entry in entries)
+        subdirectories = []
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.name in ignored_directories or (module_root and entry.name in build_output_directories):
+                    continue
+                subdirectories.append(entry.path)
+            elif entry.name.endswith(".java") and entry.is_file():
+                if java_files is not None:
+                    java_files.append(entry.path)
+                yield entry.path, is_test_file(entry.path)
+        # Visit the subdirectories depth-first in name order
+        directories.extend(reversed(subdirectories))
+
+    if manifest_file:
+        with open(manifest_file, 'w') as json_file:
+            json.dump(java_files, json_file, indent=4)
+
 def get_all_java_files(repo_path):
-    java_files = []
-    for root, dirs, files in os.walk(repo_path):
-        for file in files:
-            if file.endswith(".java"):
-                java_files.append(os.path.join(root, file))
-    return java_files
+    return [file_path for file_path, is_test in discover_java_files(repo_path)]
 
 def export_java_files_to_json(repo_path, output_file):
-    java_files = get_all_java_files(repo_path)
-    with open(output_file, 'w') as json_file:
-        json.dump(java_files, json_file, indent=4)
+    for file_path, is_test in discover_java_files(repo_path, manifest_file=output_file):
+        pass
 
-def run_maven_test(class_name, method_name=None, project_dir='.', verify=False):
+def run_maven_test(class_name, method_name=None, project_dir='.', verify=False, maven_executable='mvn'):
     # Construct the Maven command
     if verify:
-        command = f'mvn test'
+        command = f'{maven_executable} test'
     elif method_name:
-        command = f'mvn -Dtest={class_name}#{method_name} test'        
+        command = f'{maven_executable} -Dtest={class_name}#{method_name} test'        
     else:
-        command = f'mvn -Dtest={class_name} test'
+        command = f'{maven_executable} -Dtest={class_name} test'
     
     # Execute the command in the project directory
     process = subprocess.run(command, shell=True, cwd=project_dir, capture_output=True, text=True)
@@ -47,8 +101,104 @@ def run_maven_test(class_name, method_name=None, project_dir='.', verify=False):
     # Return the exit code
     return process
 
-def compile_project_with_maven(project_dir='.'):
-    command = 'mvn clean compile -DskipTests'    
+def run_maven_tests(test_classes, project_dir='.', fail_fast=True, fork_count=None, maven_executable='mvn'):
+    """
+    Run several test classes in a single Maven invocation and read the per-test results
+    from the surefire XML reports.
+
+    :param test_classes: Names of the test classes to run, or None to run the full test suite
+    :param project_dir: Root of the Maven project
+    :param fail_fast: Stop running tests after the first failure
+    :param fork_count: Number of surefire forks running test classes in parallel (e.g. 4 or 1C)
+    :param maven_executable: Maven command to run (e.g. mvnd for the Maven daemon)
+    :return: Dictionary with the overall result ('passed'), the Maven return code, the status of
+             every test ('tests', keyed by class#method) and the failed tests ('failures')
+    """
+    if test_classes is not None and not test_classes:
+        return {"passed": True, "returncode": 0, "tests": {}, "failures": []}
+
+    command = maven_executable
+    if test_classes is not None:
+        # Modules without any of the selected tests must not fail the build
+        command = (f'{maven_executable} -Dtest={",".join(test_classes)} '
+                   '-Dsurefire.failIfNoSpecifiedTests=false -DfailIfNoTests=false')
+    if fail_fast:
+        command += ' -Dsurefire.skipAfterFailureCount=1'
+    if fork_count:
+        command += f' -DforkCount={fork_count} -DreuseForks=true'
+    command += ' test'
+
+    started = time.time()
+    process = subprocess.run(command, shell=True, cwd=project_dir, capture_output=True, text=True)
+
+    print("STDOUT:", process.stdout)
+    print("STDERR:", process.stderr)
+
+    tests = parse_surefire_reports(project_dir, since=started)
+    failures = [test for test, status in tests.items() if status in ("failed", "error")]
+    return {
+        "passed": process.returncode == 0 and not failures,
+        "returncode": process.returncode,
+        "tests": tests,
+        "failures": failures
+    }
+
+def parse_surefire_reports(project_dir, since=None):
+    """
+    Read the surefire XML reports of a Maven project.
+
+    :param project_dir: Root of the Maven project
+    :param since: Only read reports written after this timestamp
+    :return: Dictionary mapping class#method to passed, failed, error or skipped
+    """
+    tests = {}
+    pattern = os.path.join(project_dir, '**', 'target', 'surefire-reports', 'TEST-*.xml')
+    for report in glob.glob(pattern, recursive=True):
+        if since is not None and os.path.getmtime(report) < since:
+            continue
+        try:
+            root = ElementTree.parse(report).getroot()
+        except ElementTree.ParseError as e:
+            print(f"Could not parse surefire report {report}: {e}")
+            continue
+        for testcase in root.iter('testcase'):
+            name = f"{testcase.get('classname')}#{testcase.get('name')}"
+            if testcase.find('failure') is not None:
+                tests[name] = "failed"
+            elif testcase.find('error') is not None:
+                tests[name] = "error"
+            elif testcase.find('skipped') is not None:
+                tests[name] = "skipped"
+            else:
+                tests[name] = "passed"
+    return tests
+
+def compile_project_with_maven(project_dir='.', changed_file=None, mode='clean', maven_executable='mvn'):
+    """
+    Compile the project and report whether the compilation succeeded.
+
+    :param project_dir: Root of the Maven project
+    :param changed_file: Path of the Java file that changed since the last build, if known
+    :param mode: 'clean' rebuilds everything (mvn clean compile), 'incremental' keeps the previous
+                 build output and only builds the module of the changed file and the modules
+                 depending on it, 'javac' compiles the changed file alone against the cached
+                 classpath of its module (falls back to 'incremental' if the classpath is unavailable)
+    :param maven_executable: Maven command to run (e.g. mvnd for the Maven daemon)
+    :return: True if the compilation succeeded
+    """
+    if mode == 'javac' and changed_file:
+        is_compiled = compile_file_with_javac(project_dir, changed_file, maven_executable)
+        if is_compiled is not None:
+            return is_compiled
+        mode = 'incremental'
+
+    if mode == 'incremental':
+        command = f'{maven_executable} compile -DskipTests'
+        module = find_maven_module(project_dir, changed_file) if changed_file else None
+        if module and module != '.':
+            command += f' -pl {module} -amd'
+    else:
+        command = f'{maven_executable} clean compile -DskipTests'
     process = subprocess.run(command, shell=True, cwd=project_dir, capture_output=True, text=True)
     
     print("STDOUT:", process.stdout)
@@ -61,6 +211,88 @@ def compile_project_with_maven(project_dir='.'):
         print("Compilation failed with return code:", process.returncode)
         return False
 
+def find_maven_module(project_dir, file_path):
+    """
+    Find the Maven module containing a file.
+
+    :param project_dir: Root of the Maven project
+    :param file_path: Path of a file inside the project
+    :return: Path of the module relative to project_dir ('.' for the root module), or None
+    """
+    project_dir = os.path.abspath(project_dir)
+    directory = os.path.dirname(os.path.abspath(file_path))
+    while os.path.commonpath([directory, project_dir]) == project_dir:
+        if os.path.isfile(os.path.join(directory, 'pom.xml')):
+            return os.path.relpath(directory, project_dir)
+        if directory == project_dir:
+            break
+        directory = os.path.dirname(directory)
+    return None
+
+_classpath_cache = {}
+
+def resolve_maven_classpath(module_dir, maven_executable='mvn'):
+    """
+    Resolve the compile classpath of a Maven module once and cache it in memory and in
+    target/refagent.classpath, which is reused until the module's pom.xml changes.
+
+    :param module_dir: Directory of the Maven module
+    :return: The classpath string, or None if it could not be resolved
+    """
+    module_dir = os.path.abspath(module_dir)
+    if module_dir in _classpath_cache:
+        return _classpath_cache[module_dir]
+
+    classpath_file = os.path.join(module_dir, 'target', 'refagent.classpath')
+    pom_file = os.path.join(module_dir, 'pom.xml')
+    if not (os.path.isfile(classpath_file) and os.path.getmtime(classpath_file) >= os.path.getmtime(pom_file)):
+        command = f'{maven_executable} -q dependency:build-classpath -Dmdep.includeScope=compile -Dmdep.outputFile={classpath_file}'
+        process = subprocess.run(command, shell=True, cwd=module_dir, capture_output=True, text=True)
+        if process.returncode != 0 or not os.path.isfile(classpath_file):
+            print("Could not resolve the classpath of", module_dir)
+            print("STDOUT:", process.stdout)
+            return None
+
+    with open(classpath_file, 'r') as file:
+        classpath = file.read().strip()
+    _classpath_cache[module_dir] = classpath
+    return classpath
+
+def compile_file_with_javac(project_dir, changed_file, maven_executable='mvn'):
+    """
+    Compile a single changed Java file with javac against the classes of its module and the
+    module's cached dependency classpath. The class files are written to a scratch folder,
+    so the build output of the project is left untouched.
+
+    :return: True or False for the compilation result, or None if the file could not be
+             compiled this way (no module or unresolved classpath)
+    """
+    module = find_maven_module(project_dir, changed_file)
+    if module is None:
+        return None
+    module_dir = os.path.join(project_dir, module)
+    classpath = resolve_maven_classpath(module_dir, maven_executable)
+    if classpath is None:
+        return None
+
+    classes_dir = os.path.join(module_dir, 'target', 'classes')
+    source_dir = os.path.join(module_dir, 'src', 'main', 'java')
+    with tempfile.TemporaryDirectory() as output_dir:
+        command = ['javac', '-nowarn', '-proc:none', '-implicit:none', '-d', output_dir,
+                   '-cp', os.pathsep.join(filter(None, [classes_dir, classpath])),
+                   '-sourcepath', source_dir, changed_file]
+        process = subprocess.run(command, capture_output=True, text=True)
+
+    print("STDOUT:", process.stdout)
+    print("STDERR:", process.stderr)
+
+    if process.returncode == 0:
+        print("Compilation successful!")
+        return True
+    else:
+        print("Compilation failed with return code:", process.returncode)
+        return False
+
 def create_directory_if_not_exists(directory_path):
     try:
         os.makedirs(directory_path, exist_ok=True)
@@ -116,7 +348,7 @@ def find_test_files(file_paths):
 def find_non_test_files(file_paths):
     test_files = []
     for file_path in file_paths:    
-        if "test" not in str.lower(file_path):
+        if not is_test_file(file_path):
             test_files.append(file_path)
     return test_files
 
@@ -125,10 +357,15 @@ def extract_ids(data):
 
 import javalang
 
-def extract_class_name(java_file_path):
+def extract_class_name(java_file_path, parse_cache=None):
     class_name = None
     
     try:
+        if parse_cache is not None:
+            # The cached facts list the class declarations in traversal order
+            classes = parse_cache.facts_for_file(java_file_path)["classes"]
+            return classes[0]["name"] if classes else None
+
         with open(java_file_path, 'r') as file:
             java_code = file.read()
             
@@ -182,29 +419,18 @@ def commit_file_to_github(repo_path, file_path, commit_message, branch='main'):
         print(f"An error occurred: {str(e)}")
 
 
-def extract_refactoring_types(json_file_path):
+def refactoring_types_from_data(data):
     """
-    Extracts the 'type' field from each refactoring in the given JSON file.
+    Extracts the 'type' field from each refactoring of loaded RefactoringMiner JSON.
 
     Args:
-        json_file_path (str): Path to the JSON file.
+        data (dict): Content of a RefactoringMiner JSON file.
 
     Returns:
         list: A list containing the 'type' of each refactoring.
     """
     refactoring_types = []
 
-    try:
-        # Load the JSON from a file
-        with open(json_file_path, 'r') as file:
-            data = json.load(file)
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON: {e}")
-        return refactoring_types  # Return empty list on error
-    except FileNotFoundError:
-        print(f"File not found: {json_file_path}")
-        return refactoring_types  # Return empty list if file is not found
-
     # Ensure data has the expected structure
     commits = data.get('commits', [])
     if not isinstance(commits, list):
@@ -223,6 +449,31 @@ def extract_refactoring_types(json_file_path):
 
     return refactoring_types
 
+def extract_refactoring_types(json_file_path):
+    """
+    Extracts the 'type' field from each refactoring in the given JSON file.
+
+    Args:
+        json_file_path (str): Path to the JSON file.
+
+    Returns:
+        list: A list containing the 'type' of each refactoring.
+    """
+    refactoring_types = []
+
+    try:
+        # Load the JSON from a file
+        with open(json_file_path, 'r') as file:
+            data = json.load(file)
+    except json.JSONDecodeError as e:
+        print(f"Error decoding JSON: {e}")
+        return refactoring_types  # Return empty list on error
+    except FileNotFoundError:
+        print(f"File not found: {json_file_path}")
+        return refactoring_types  # Return empty list if file is not found
+
+    return refactoring_types_from_data(data)
+
 
 def iterate_over_json_files(repo_path):
     """
@@ -246,13 +497,13 @@ def iterate_over_json_files(repo_path):
 
     return all_refactoring_types
 
-def transform_json_file(json_file_path):
+def code_elements_from_data(data):
     """
-    Reads a JSON file and transforms the data into a list of dictionaries:
+    Transforms loaded RefactoringMiner JSON into a list of dictionaries:
     [{codeElement: [refactoring types as unit]}]
 
     Args:
-        json_file_path (str): The path to the JSON file.
+        data (dict): Content of a RefactoringMiner JSON file.
 
     Returns:
         list: A list of dictionaries where each dictionary maps a code element
@@ -260,17 +511,6 @@ def transform_json_file(json_file_path):
     """
     code_element_to_types = {}  # Temporary dictionary to collect code elements
 
-    try:
-        # Load the JSON from a file
-        with open(json_file_path, 'r') as file:
-            data = json.load(file)
-    except json.JSONDecodeError as e:
-        print(f"Error decoding JSON: {e}")
-        return []  # Return empty list on error
-    except FileNotFoundError:
-        print(f"File not found: {json_file_path}")
-        return []  # Return empty list if file is not found
-
     # Process each commit
     for commit in data.get('commits', []):
         # Process each refactoring
@@ -293,6 +533,31 @@ def transform_json_file(json_file_path):
 
     return code_element_list
 
+def transform_json_file(json_file_path):
+    """
+    Reads a JSON file and transforms the data into a list of dictionaries:
+    [{codeElement: [refactoring types as unit]}]
+
+    Args:
+        json_file_path (str): The path to the JSON file.
+
+    Returns:
+        list: A list of dictionaries where each dictionary maps a code element
+              to a list of refactoring types.
+    """
+    try:
+        # Load the JSON from a file
+        with open(json_file_path, 'r') as file:
+            data = json.load(file)
+    except json.JSONDecodeError as e:
+        print(f"Error decoding JSON: {e}")
+        return []  # Return empty list on error
+    except FileNotFoundError:
+        print(f"File not found: {json_file_path}")
+        return []  # Return empty list if file is not found
+
+    return code_elements_from_data(data)
+
 
 def iterate_over_json_files_by_codelements(repo_path):
     """
@@ -427,6 +692,29 @@ def create_separate_metrics_boxplots(llm_files, dev_files, metrics,repo_names, o
         plt.savefig(os.path.join(output_folder, f"{metric}_comparison_plot.png"))
         plt.close()
 
+def code_element_types_from_data(json_content):
+    """
+    Extracts the `codeElementType` values from the `rightSideLocations` of each refactoring
+    of loaded RefactoringMiner JSON.
+
+    Args:
+        json_content (dict): Content of a RefactoringMiner JSON file.
+
+    Returns:
+        dict: A dictionary of refactoring types and their `codeElementType` values.
+    """
+    refactoring_data = {}
+
+    # Extract data from JSON
+    for commit in json_content.get("commits", []):
+        for refactoring in commit.get("refactorings", []):
+            refactoring_type = refactoring.get("type")
+            right_side_locations = refactoring.get("rightSideLocations", [])
+            code_element_types = [location.get("codeElementType") for location in right_side_locations]
+            refactoring_data[refactoring_type] = code_element_types
+
+    return refactoring_data
+
 def extract_code_element_types_from_files(folder_path):
     """
     Walks through the folders and processes all JSON files to extract `codeElementType` values
@@ -452,18 +740,9 @@ def extract_code_element_types_from_files(folder_path):
                     
                     with open(file_path, 'r') as json_file:
                         json_content = json.load(json_file)
-                        refactoring_data = {}
-
-                        # Extract data from JSON
-                        for commit in json_content.get("commits", []):
-                            for refactoring in commit.get("refactorings", []):
-                                refactoring_type = refactoring.get("type")
-                                right_side_locations = refactoring.get("rightSideLocations", [])
-                                code_element_types = [location.get("codeElementType") for location in right_side_locations]
-                                refactoring_data[refactoring_type] = code_element_types
-
-                        # Store the result for this file
-                        result[file] = refactoring_data
+
+                    # Store the result for this file
+                    result[file] = code_element_types_from_data(json_content)
                 except:
                     continue
 
@@ -471,6 +750,22 @@ def extract_code_element_types_from_files(folder_path):
 
     return result
 
+def iter_transactions(all_results, refactoring_type="Extract Method"):
+    """
+    Yield the transactions for the specified refactoring type one at a time.
+
+    Args:
+        all_results (dict): The result dictionary containing refactorings and their code elements.
+        refactoring_type (str): The refactoring type to filter for transactions.
+
+    Yields:
+        list: The codeElementType values of one refactoring.
+    """
+    for file_name, refactorings in all_results.items():
+        for ref_type, code_element_types in refactorings.items():
+            if ref_type == refactoring_type:
+                yield code_element_types
+
 def extract_transactions(all_results, refactoring_type="Extract Method"):
     """
     Extract transactions for the specified refactoring type.
@@ -482,34 +777,54 @@ def extract_transactions(all_results, refactoring_type="Extract Method"):
     Returns:
         list: A list of transactions, where each transaction is a list of codeElementType values.
     """
-    transactions = []
-    for file_name, refactorings in all_results.items():
-        for ref_type, code_element_types in refactorings.items():
-            if ref_type == refactoring_type:
-                transactions.append(code_element_types)
-    return transactions
+    return list(iter_transactions(all_results, refactoring_type))
 
-def perform_association_rule_mining(transactions, min_support=0.5, min_confidence=0.7):
+def encode_transactions(transactions):
+    """
+    One-hot encode transactions into a sparse boolean DataFrame in a single pass, so only the
+    items present in each transaction are stored.
+
+    Args:
+        transactions (iterable): Transactions (lists of items), e.g. from iter_transactions.
+
+    Returns:
+        pd.DataFrame: A sparse transactions x items DataFrame, items in order of first appearance.
+    """
+    columns = {}
+    indices = []
+    indptr = [0]
+    for transaction in transactions:
+        row = {columns.setdefault(item, len(columns)) for item in transaction}
+        indices.extend(sorted(row))
+        indptr.append(len(indices))
+
+    one_hot = sparse.csr_matrix((np.ones(len(indices), dtype=bool), indices, indptr),
+                                shape=(len(indptr) - 1, len(columns)))
+    return pd.DataFrame.sparse.from_spmatrix(one_hot, columns=list(columns))
+
+def perform_association_rule_mining(transactions, min_support=0.5, min_confidence=0.7, algorithm="fpgrowth"):
     """
     Perform association rule mining on the provided transactions.
 
     Args:
-        transactions (list): A list of transactions.
+        transactions (iterable): A list (or any iterable, e.g. iter_transactions) of transactions.
         min_support (float): Minimum support threshold for frequent itemsets.
         min_confidence (float): Minimum confidence threshold for rules.
+        algorithm (str): "fpgrowth" or "apriori" (low-memory mode) to find the frequent itemsets.
 
     Returns:
         pd.DataFrame: A DataFrame containing the association rules.
     """
-    # Convert transactions to a DataFrame for mlxtend
-    all_items = set(item for transaction in transactions for item in transaction)
-    one_hot_encoded = pd.DataFrame([
-        {item: (item in transaction) for item in all_items}
-        for transaction in transactions
-    ])
-
-    # Generate frequent itemsets
-    frequent_itemsets = apriori(one_hot_encoded, min_support=min_support, use_colnames=True)
+    # Sparse one-hot encoding of the transactions for mlxtend
+    one_hot_encoded = encode_transactions(transactions)
+
+    # Generate frequent itemsets, items below the minimum support are pruned before any combination
+    if algorithm == "fpgrowth":
+        frequent_itemsets = fpgrowth(one_hot_encoded, min_support=min_support, use_colnames=True)
+    elif algorithm == "apriori":
+        frequent_itemsets = apriori(one_hot_encoded, min_support=min_support, use_colnames=True, low_memory=True)
+    else:
+        raise ValueError(f"Unknown algorithm: {algorithm}")
 
     # Generate association rules
     rules = association_rules(frequent_itemsets, metric="confidence", min_threshold=min_confidence)